@@ -0,0 +1,63 @@
+"""Отдельные база и кэш для бенчмарков.
+
+Бенчмарки создают своих пользователей и посты, сбрасывают версии лент и
+очищают кэш. Всё это идёт в отдельную базу-файл и в отдельный кэш того
+же бэкенда, что у сайта, поэтому прогон не трогает ни данные, ни
+закэшированные страницы, пользователей и сессии сайта.
+"""
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.test import override_settings
+
+LOCMEM = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+def isolated_caches() -> dict:
+    """CACHES, в которых кэш по умолчанию — свой у бенчмарков.
+
+    sqlite и file получают свой файл и каталог, locmem — своё имя.
+    Общий сервер memcached при очистке сбросился бы целиком, поэтому
+    вместо него берётся locmem.
+    """
+    default = dict(settings.CACHES['default'])
+    if default['BACKEND'] == settings.CACHE_BACKENDS['sqlite'][0]:
+        default['LOCATION'] = f'{settings.BENCHMARK_CACHE_NAME}.sqlite3'
+    elif default['BACKEND'] == settings.CACHE_BACKENDS['file'][0]:
+        default['LOCATION'] = settings.BENCHMARK_CACHE_NAME
+    else:
+        default = {'BACKEND': LOCMEM, 'LOCATION': 'benchmark'}
+    return {**settings.CACHES, 'default': default}
+
+
+@contextmanager
+def isolated_cache():
+    """Подменяет кэш по умолчанию кэшем бенчмарков на время блока.
+
+    Кэш очищается до и после блока: записи прошлого прогона ссылаются
+    на строки уже пересозданной базы.
+    """
+    with override_settings(CACHES=isolated_caches()):
+        caches['default'].clear()
+        try:
+            yield caches['default']
+        finally:
+            caches['default'].clear()
+
+
+@contextmanager
+def isolated():
+    """Отдельные база (BENCHMARK_DATABASE_NAME) и кэш на время блока."""
+    with isolated_cache():
+        connection.settings_dict['TEST']['NAME'] = (
+            settings.BENCHMARK_DATABASE_NAME
+        )
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True
+        )
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -0,0 +1,167 @@
+"""Генератор нагрузки: запросы к приложению прямо в процессе.
+
+Каждый рабочий процесс ходит в WSGI-приложение через django.test.Client,
+без сети, по смеси маршрутов с заданными весами, и записывает время
+каждого ответа. Чтение идёт анонимно, лента подписки и запись — от имени
+случайного пользователя. Число SQL-запросов каждого ответа берётся из
+заголовка Server-Timing.
+"""
+import multiprocessing
+import random
+import re
+import time
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+User = get_user_model()
+
+DEFAULT_MIX = {
+    'index': 30,
+    'index_user': 5,
+    'group_list': 15,
+    'profile': 15,
+    'post_detail': 20,
+    'follow_index': 8,
+    'add_comment': 5,
+    'post_create': 2,
+}
+
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def parse_mix(text):
+    """'index=3,profile=1' -> {'index': 3, 'profile': 1}."""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in DEFAULT_MIX:
+            raise ValueError(f'Неизвестный маршрут: {name}')
+        mix[name.strip()] = int(weight or 1)
+    return mix
+
+
+class Worker:
+    """Один поток запросов к приложению."""
+
+    def __init__(self, data, number, random_seed=0):
+        self.data = data
+        self.rng = random.Random(random_seed * 1000 + number)
+        self.anonymous = Client()
+        self.client = Client()
+        self.client.force_login(self._user())
+
+    def _user(self):
+        return User.objects.get(pk=self.rng.choice(self.data['users']))
+
+    def request(self, name):
+        """Выполняет запрос маршрута name и возвращает ответ."""
+        rng = self.rng
+        if name == 'index':
+            return self.anonymous.get(
+                reverse('posts_page:index'), {'page': rng.randint(1, 5)}
+            )
+        if name == 'index_user':
+            return self.client.get(reverse('posts_page:index'))
+        if name == 'group_list':
+            slug = rng.choice(self.data['groups'])
+            return self.anonymous.get(
+                reverse('posts_page:group_list', args=(slug,))
+            )
+        if name == 'profile':
+            return self.anonymous.get(
+                reverse(
+                    'posts_page:profile',
+                    args=(rng.choice(self.data['usernames']),),
+                )
+            )
+        if name == 'post_detail':
+            post_id = rng.choice(self.data['posts'])
+            return self.anonymous.get(
+                reverse('posts_page:post_detail', args=(post_id,))
+            )
+        if name == 'follow_index':
+            return self.client.get(reverse('posts_page:follow_index'))
+        if name == 'add_comment':
+            post_id = rng.choice(self.data['posts'])
+            return self.client.post(
+                reverse('posts_page:add_comment', args=(post_id,)),
+                {'text': 'Комментарий нагрузочного теста'},
+            )
+        if name == 'post_create':
+            return self.client.post(
+                reverse('posts_page:post_create'),
+                {'text': 'Пост нагрузочного теста'},
+            )
+        raise ValueError(f'Неизвестный маршрут: {name}')
+
+    def run(self, mix, requests):
+        """Выполняет requests запросов.
+
+        Возвращает времена ответов, число ошибок и число SQL-запросов
+        каждого ответа по маршрутам.
+        """
+        names, weights = list(mix), list(mix.values())
+        timings = defaultdict(list)
+        errors = defaultdict(int)
+        queries = defaultdict(list)
+        for _ in range(requests):
+            name = self.rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                response = self.request(name)
+                failed = response.status_code >= 400
+            except Exception:
+                response, failed = None, True
+            timings[name].append(time.perf_counter() - start)
+            if failed:
+                errors[name] += 1
+            match = response and SERVER_TIMING_QUERIES.search(
+                response.get('Server-Timing', '')
+            )
+            if match:
+                queries[name].append(int(match.group(1)))
+        return dict(timings), dict(errors), dict(queries)
+
+
+def _run_worker(args):
+    data, number, mix, requests, random_seed = args
+    try:
+        return Worker(data, number, random_seed).run(mix, requests)
+    finally:
+        connections.close_all()
+
+
+def run(data, mix, requests, workers=1, random_seed=0):
+    """Гоняет нагрузку в workers процессах по requests запросов в каждом.
+
+    Возвращает времена ответов, число ошибок и число SQL-запросов
+    по маршрутам, а также общее время прогона в секундах.
+    """
+    jobs = [
+        (data, number, mix, requests, random_seed)
+        for number in range(workers)
+    ]
+    start = time.perf_counter()
+    if workers == 1:
+        results = [Worker(data, 0, random_seed).run(mix, requests)]
+    else:
+        # Дочерние процессы не должны делить соединение с родителем.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        with context.Pool(workers) as pool:
+            results = pool.map(_run_worker, jobs)
+    elapsed = time.perf_counter() - start
+    timings, errors = defaultdict(list), defaultdict(int)
+    queries = defaultdict(list)
+    for worker_timings, worker_errors, worker_queries in results:
+        for name, values in worker_timings.items():
+            timings[name].extend(values)
+        for name, count in worker_errors.items():
+            errors[name] += count
+        for name, values in worker_queries.items():
+            queries[name].extend(values)
+    return dict(timings), dict(errors), dict(queries), elapsed
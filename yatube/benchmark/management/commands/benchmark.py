@@ -0,0 +1,93 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmark import environment, load, report
+from benchmark.seed import SeedSize, seed
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест: заполняет отдельную базу синтетическими данными '
+        'и гоняет по страницам смесь запросов в нескольких процессах, '
+        'печатая p50/p95/p99, пропускную способность и среднее число '
+        'SQL-запросов по маршрутам.'
+    )
+
+    def add_arguments(self, parser):
+        for name, default in vars(SeedSize()).items():
+            parser.add_argument(
+                f'--{name}',
+                type=int,
+                default=default,
+                help=f'Сколько создать: {name}.',
+            )
+        parser.add_argument(
+            '--workers', type=int, default=4, help='Число процессов.'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=500,
+            help='Сколько запросов выполняет каждый процесс.',
+        )
+        parser.add_argument(
+            '--mix',
+            help='Веса маршрутов, например index=5,post_detail=2.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--save-baseline', metavar='NAME', help='Сохранить как эталон.'
+        )
+        parser.add_argument(
+            '--compare', metavar='NAME', help='Сравнить с эталоном.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            mix = load.parse_mix(options['mix']) if options['mix'] else (
+                load.DEFAULT_MIX
+            )
+            baseline = options['compare'] and report.load_baseline(
+                settings.BENCHMARK_BASELINE_DIR, options['compare']
+            )
+        except (ValueError, OSError) as error:
+            raise CommandError(error)
+
+        settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+        # Тест идёт на отдельных базе-файле и кэше, общих для всех
+        # процессов.
+        with environment.isolated():
+            size = SeedSize(
+                **{name: options[name] for name in vars(SeedSize())}
+            )
+            self.stdout.write('Заполнение базы…')
+            data = seed(size, options['seed'])
+            self.stdout.write('Нагрузка…')
+            timings, errors, queries, elapsed = load.run(
+                data,
+                mix,
+                options['requests'],
+                options['workers'],
+                options['seed'],
+            )
+
+        result = report.summarize(timings, errors, elapsed, queries)
+        self.stdout.write(report.format_report(result, baseline))
+        if options['save_baseline']:
+            report.save_baseline(
+                settings.BENCHMARK_BASELINE_DIR,
+                options['save_baseline'],
+                result,
+                {
+                    **{
+                        key: options[key]
+                        for key in (*vars(SeedSize()), 'workers', 'requests')
+                    },
+                    'mix': mix,
+                },
+            )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Эталон {options["save_baseline"]} сохранён.'
+                )
+            )
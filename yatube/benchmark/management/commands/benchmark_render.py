@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from benchmark import environment, render
+from benchmark.seed import SeedSize, seed
+
+
+class Command(BaseCommand):
+    help = (
+        'Микробенчмарк рендера страницы ленты: карточки через '
+        '{% include %} против тега {% post_card %}, время на страницу.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=settings.SHOWING_POSTS,
+            help='Постов на странице.',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=200,
+            help='Сколько раз рендерить страницу каждым способом.',
+        )
+
+    def handle(self, *args, **options):
+        # Посты создаются в отдельных базе и кэше, как у нагрузочного
+        # теста.
+        with environment.isolated():
+            seed(SeedSize(
+                users=20, groups=5, posts=options['page_size'] * 5,
+                comments=0, follows=0,
+            ))
+            result = render.run(options['page_size'], options['repeat'])
+
+        baseline = result['include']
+        for name, milliseconds in result.items():
+            self.stdout.write('{:<24}{:>10.3f} мс{:>10}'.format(
+                name,
+                milliseconds,
+                f'×{baseline / milliseconds:.1f}' if milliseconds else '',
+            ))
@@ -0,0 +1,71 @@
+"""Микробенчмарк рендера ленты: {% include %} против {% post_card %}.
+
+Одна и та же страница из page_size постов рендерится много раз:
+карточками через {% include 'posts/post.html' %} на каждой итерации,
+тегом {% post_card %} с пустым кэшем карточек и тегом с заполненным
+кэшем — так, как страница рендерится после изменения одного поста.
+Кэш карточек — свой у бенчмарка (benchmark.environment), очищается
+только он.
+"""
+import time
+
+from django.template import engines
+from django.test import RequestFactory
+
+from posts.models import Post
+
+from .environment import isolated_cache
+
+PAGES = {
+    'include': (
+        "{% for post in page_obj %}"
+        "{% include 'posts/post.html' %}"
+        "{% endfor %}"
+    ),
+    'post_card': (
+        "{% load post_cards %}"
+        "{% for post in page_obj %}{% post_card post %}{% endfor %}"
+    ),
+}
+
+
+def page(page_size):
+    """Страница ленты, как её выбирает главная."""
+    return list(
+        Post.objects.select_related('author', 'group')[:page_size]
+    )
+
+
+def render_page(name, posts) -> str:
+    """Рендерит страницу способом name, как в новом запросе."""
+    template = engines['django'].from_string(PAGES[name])
+    request = RequestFactory().get('/')
+    return template.render({'page_obj': posts, 'request': request})
+
+
+def _measure(name, posts, repeat, clear=None) -> float:
+    """Среднее время рендера; clear — кэш, очищаемый перед каждым."""
+    total = 0.0
+    for _ in range(repeat):
+        if clear is not None:
+            clear.clear()
+        start = time.perf_counter()
+        render_page(name, posts)
+        total += time.perf_counter() - start
+    return round(total / repeat * 1000, 3)
+
+
+def run(page_size=10, repeat=200) -> dict:
+    """Среднее время рендера страницы в мс по способам."""
+    posts = page(page_size)
+    with isolated_cache() as cache:
+        # Первый рендер компилирует шаблоны и заполняет кэш карточек.
+        render_page('include', posts)
+        render_page('post_card', posts)
+        return {
+            'include': _measure('include', posts, repeat),
+            'post_card (пустой кэш)': _measure(
+                'post_card', posts, repeat, clear=cache
+            ),
+            'post_card': _measure('post_card', posts, repeat),
+        }
@@ -0,0 +1,100 @@
+"""Сводка прогона и сравнение с сохранённым эталоном."""
+import json
+import os
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга; values отсортированы."""
+    if not values:
+        return 0.0
+    rank = max(int(round(percent / 100 * len(values))) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def _row(values, errors, elapsed, queries):
+    values = sorted(values)
+    row = {
+        'requests': len(values),
+        'errors': errors,
+        'rps': round(len(values) / elapsed, 1) if elapsed else 0.0,
+    }
+    for percent in PERCENTILES:
+        row[f'p{percent}_ms'] = round(percentile(values, percent) * 1000, 2)
+    row['queries'] = (
+        round(sum(queries) / len(queries), 2) if queries else 0.0
+    )
+    return row
+
+
+def summarize(timings, errors, elapsed, queries=None):
+    """Строки отчёта по маршрутам и итоговая строка 'total'.
+
+    queries — число SQL-запросов каждого ответа по маршрутам; в отчёт
+    попадает среднее на запрос.
+    """
+    queries = queries or {}
+    report = {
+        name: _row(
+            values, errors.get(name, 0), elapsed, queries.get(name, [])
+        )
+        for name, values in sorted(timings.items())
+    }
+    report['total'] = _row(
+        [value for values in timings.values() for value in values],
+        sum(errors.values()),
+        elapsed,
+        [value for values in queries.values() for value in values],
+    )
+    return report
+
+
+def format_report(report, baseline=None):
+    """Таблица отчёта; с эталоном — с изменением p95, rps и SQL в %."""
+    header = '{:<14}{:>9}{:>8}{:>10}{:>10}{:>10}{:>10}{:>8}'.format(
+        'маршрут', 'запросы', 'ошибки', 'rps', 'p50 мс', 'p95 мс', 'p99 мс',
+        'SQL',
+    )
+    if baseline:
+        header += '{:>10}{:>10}{:>10}'.format('Δ p95', 'Δ rps', 'Δ SQL')
+    lines = [header]
+    for name, row in report.items():
+        line = '{:<14}{:>9}{:>8}{:>10}{:>10}{:>10}{:>10}{:>8}'.format(
+            name, row['requests'], row['errors'], row['rps'],
+            row['p50_ms'], row['p95_ms'], row['p99_ms'], row['queries'],
+        )
+        if baseline and name in baseline:
+            line += '{:>10}{:>10}{:>10}'.format(
+                _change(baseline[name]['p95_ms'], row['p95_ms']),
+                _change(baseline[name]['rps'], row['rps']),
+                _change(baseline[name].get('queries'), row['queries']),
+            )
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def _change(before, after):
+    if not before:
+        return '-'
+    return '{:+.1f}%'.format((after - before) / before * 100)
+
+
+def baseline_path(directory, name):
+    return os.path.join(directory, f'{name}.json')
+
+
+def save_baseline(directory, name, report, options):
+    os.makedirs(directory, exist_ok=True)
+    with open(baseline_path(directory, name), 'w', encoding='utf-8') as file:
+        json.dump(
+            {'options': options, 'report': report},
+            file,
+            ensure_ascii=False,
+            indent=2,
+        )
+
+
+def load_baseline(directory, name):
+    with open(baseline_path(directory, name), encoding='utf-8') as file:
+        return json.load(file)['report']
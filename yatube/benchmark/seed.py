@@ -0,0 +1,91 @@
+"""Синтетические данные для нагрузочного теста."""
+import random
+from dataclasses import dataclass
+
+from django.contrib.auth import get_user_model
+
+from posts.content import rebuild_derived
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+
+
+@dataclass
+class SeedSize:
+    users: int = 200
+    groups: int = 20
+    posts: int = 5000
+    comments: int = 20000
+    follows: int = 2000
+
+
+def _words(rng, count):
+    return ' '.join(
+        rng.choice(('пост', 'лента', 'автор', 'группа', 'комментарий',
+                    'подписка', 'картинка', 'новость', 'день', 'город'))
+        for _ in range(count)
+    )
+
+
+def seed(size, random_seed=0):
+    """Заполняет базу и возвращает id созданных объектов по типам."""
+    rng = random.Random(random_seed)
+    User.objects.bulk_create(
+        User(username=f'bench_{number}', password='!')
+        for number in range(size.users)
+    )
+    users = list(
+        User.objects.filter(username__startswith='bench_')
+        .values_list('pk', 'username')
+    )
+    user_ids = [pk for pk, _ in users]
+    Group.objects.bulk_create(
+        Group(
+            title=f'Группа {number}',
+            slug=f'bench-{number}',
+            description=_words(rng, 10),
+        )
+        for number in range(size.groups)
+    )
+    groups = list(
+        Group.objects.filter(slug__startswith='bench-')
+        .values_list('pk', 'slug')
+    )
+    Post.objects.bulk_create(
+        Post(
+            text=_words(rng, 30),
+            author_id=rng.choice(user_ids),
+            group_id=rng.choice(groups)[0] if rng.random() < 0.7 else None,
+        )
+        for _ in range(size.posts)
+    )
+    post_ids = list(Post.objects.values_list('pk', flat=True))
+    Comment.objects.bulk_create(
+        Comment(
+            text=_words(rng, 12),
+            author_id=rng.choice(user_ids),
+            post_id=rng.choice(post_ids),
+        )
+        for _ in range(size.comments)
+    )
+    pairs = {
+        (rng.choice(user_ids), rng.choice(user_ids))
+        for _ in range(size.follows)
+    }
+    Follow.objects.bulk_create(
+        (
+            Follow(user_id=user, author_id=author)
+            for user, author in pairs
+            if user != author
+        ),
+        ignore_conflicts=True,
+    )
+    rebuild_derived(BATCH_SIZE)
+    return {
+        'users': user_ids,
+        'usernames': [username for _, username in users],
+        'groups': [slug for _, slug in groups],
+        'posts': post_ids,
+    }
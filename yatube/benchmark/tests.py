@@ -0,0 +1,106 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from posts.models import Comment, Post
+
+from . import environment, load, render, report
+from .seed import SeedSize, seed
+
+
+class BenchmarkTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.data = seed(
+            SeedSize(users=10, groups=3, posts=40, comments=60, follows=20)
+        )
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def test_seed(self):
+        """Данные создаются с пересчитанными счётчиками"""
+        self.assertEqual(Post.objects.count(), 40)
+        self.assertEqual(Comment.objects.count(), 60)
+        post = Post.objects.order_by('-comment_count').first()
+        self.assertEqual(post.comment_count, post.comments.count())
+
+    def test_worker_drives_every_route(self):
+        """Рабочий проходит по всем маршрутам смеси без ошибок"""
+        timings, errors, queries, elapsed = load.run(
+            self.data, load.DEFAULT_MIX, requests=60
+        )
+
+        self.assertEqual(errors, {})
+        self.assertEqual(set(timings), set(load.DEFAULT_MIX))
+        self.assertEqual(set(queries), set(load.DEFAULT_MIX))
+        result = report.summarize(timings, errors, elapsed, queries)
+        self.assertEqual(result['total']['requests'], 60)
+        self.assertLessEqual(
+            result['total']['p50_ms'], result['total']['p99_ms']
+        )
+
+    def test_percentile(self):
+        values = [float(value) for value in range(1, 101)]
+
+        self.assertEqual(report.percentile(values, 50), 50.0)
+        self.assertEqual(report.percentile(values, 99), 99.0)
+        self.assertEqual(report.percentile([], 95), 0.0)
+
+    def test_parse_mix(self):
+        self.assertEqual(
+            load.parse_mix('index=3,profile'), {'index': 3, 'profile': 1}
+        )
+        with self.assertRaises(ValueError):
+            load.parse_mix('unknown=1')
+
+    def test_render_benchmark(self):
+        """Бенчмарк рендерит страницу всеми способами"""
+        result = render.run(page_size=10, repeat=2)
+
+        self.assertEqual(
+            set(result), {'include', 'post_card (пустой кэш)', 'post_card'}
+        )
+
+    def test_render_benchmark_keeps_site_cache(self):
+        """Бенчмарк очищает только свой кэш"""
+        cache.set('session:site', 'сессия')
+
+        render.run(page_size=10, repeat=2)
+
+        self.assertEqual(cache.get('session:site'), 'сессия')
+
+    def test_post_card_page_from_cache(self):
+        """Повторный рендер страницы карточками не ходит в базу"""
+        posts = render.page(10)
+        render.render_page('post_card', posts)
+
+        with self.assertNumQueries(0):
+            html = render.render_page('post_card', posts)
+
+        self.assertEqual(html, render.render_page('include', posts))
+
+    def test_isolated_cache_keeps_site_cache(self):
+        """Кэш бенчмарков очищается, не трогая кэш сайта"""
+        cache.set('page:site', 'страница')
+
+        with environment.isolated_cache() as isolated:
+            self.assertIsNone(cache.get('page:site'))
+            cache.set('page:bench', 'страница')
+            self.assertEqual(isolated.get('page:bench'), 'страница')
+
+        self.assertEqual(cache.get('page:site'), 'страница')
+        self.assertIsNone(cache.get('page:bench'))
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'core.cache.SQLiteCache', 'LOCATION': '/srv/cache.sqlite3',
+    }})
+    def test_isolated_sqlite_cache_location(self):
+        """Кэш SQLite бенчмарков лежит в своём файле"""
+        default = environment.isolated_caches()['default']
+
+        self.assertEqual(default['BACKEND'], 'core.cache.SQLiteCache')
+        self.assertEqual(
+            default['LOCATION'], f'{settings.BENCHMARK_CACHE_NAME}.sqlite3'
+        )
@@ -0,0 +1,232 @@
+"""Кэш в файле SQLite, общий для всех процессов сервера на одной машине.
+
+LocMemCache у каждого воркера свой: фрагменты дублируются, а версии лент,
+увеличенные в одном процессе, другие не видят. Этот бэкенд хранит записи
+в одной базе SQLite в режиме WAL, поэтому читать её могут все воркеры
+сразу, а запись и incr атомарны между процессами.
+
+Размер ограничен числом записей (MAX_ENTRIES) и суммарным объёмом
+значений в байтах (MAX_SIZE). Текущие число записей и объём триггеры
+держат в отдельной строке, поэтому проверка лимитов при записи не
+проходит по всей таблице. При превышении сначала удаляются просроченные
+записи, затем давно не читавшиеся (LRU).
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+TABLE = 'cache'
+STATS_TABLE = 'cache_stats'
+# Время последнего чтения обновляется не чаще раза в секунду, чтобы
+# чтения почти не превращались в запись.
+ACCESS_RESOLUTION = 1.0
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_size = int(options.get('MAX_SIZE', 64 * 1024 * 1024))
+        self._local = threading.local()
+
+    def _connection(self):
+        # Соединение своё у каждого потока и у каждого процесса после fork.
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(
+            self._path, timeout=30, isolation_level=None
+        )
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        # Иначе INSERT OR REPLACE удаляет старую запись без триггера.
+        connection.execute('PRAGMA recursive_triggers=ON')
+        self._local.connection, self._local.pid = connection, os.getpid()
+        self._write(self._create_tables)
+        return connection
+
+    def _create_tables(self, connection):
+        connection.execute(
+            f'CREATE TABLE IF NOT EXISTS {TABLE} ('
+            'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+            'expires REAL, accessed REAL NOT NULL, size INTEGER NOT NULL)'
+        )
+        connection.execute(
+            f'CREATE INDEX IF NOT EXISTS {TABLE}_accessed '
+            f'ON {TABLE} (accessed)'
+        )
+        connection.execute(
+            f'CREATE TABLE IF NOT EXISTS {STATS_TABLE} ('
+            'id INTEGER PRIMARY KEY CHECK (id = 0), '
+            'entries INTEGER NOT NULL, size INTEGER NOT NULL)'
+        )
+        for event, change in (
+            ('INSERT', 'entries = entries + 1, size = size + NEW.size'),
+            ('DELETE', 'entries = entries - 1, size = size - OLD.size'),
+            ('UPDATE OF size', 'size = size - OLD.size + NEW.size'),
+        ):
+            name = event.split()[0].lower()
+            connection.execute(
+                f'CREATE TRIGGER IF NOT EXISTS {TABLE}_{name} '
+                f'AFTER {event} ON {TABLE} BEGIN '
+                f'UPDATE {STATS_TABLE} SET {change}; END'
+            )
+        if connection.execute(f'SELECT 1 FROM {STATS_TABLE}').fetchone():
+            return
+        connection.execute(
+            f'INSERT INTO {STATS_TABLE} (id, entries, size) '
+            f'SELECT 0, count(*), total(size) FROM {TABLE}'
+        )
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _write(self, statements):
+        """Выполняет функцию statements(connection) в транзакции записи."""
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            result = statements(connection)
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return result
+
+    def _row(self, connection, key, now):
+        return connection.execute(
+            f'SELECT value, accessed FROM {TABLE} '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, now),
+        ).fetchone()
+
+    def _store(self, connection, key, value, timeout, now):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        connection.execute(
+            f'INSERT OR REPLACE INTO {TABLE} '
+            '(key, value, expires, accessed, size) VALUES (?, ?, ?, ?, ?)',
+            (key, data, self.get_backend_timeout(timeout), now, len(data)),
+        )
+        self._cull(connection, now)
+
+    def _stats(self, connection):
+        return connection.execute(
+            f'SELECT entries, size FROM {STATS_TABLE}'
+        ).fetchone()
+
+    def _fits(self, count, size) -> bool:
+        return count <= self._max_entries and size <= self._max_size
+
+    def _cull(self, connection, now):
+        if self._fits(*self._stats(connection)):
+            return
+        connection.execute(
+            f'DELETE FROM {TABLE} WHERE expires IS NOT NULL AND expires <= ?',
+            (now,),
+        )
+        count, size = self._stats(connection)
+        # Удаляем давно не читавшиеся записи, пока не уложимся в лимиты.
+        rows = connection.execute(
+            f'SELECT key, size FROM {TABLE} ORDER BY accessed'
+        )
+        stale = []
+        for key, row_size in rows:
+            if self._fits(count, size):
+                break
+            stale.append((key,))
+            count -= 1
+            size -= row_size
+        rows.close()
+        connection.executemany(f'DELETE FROM {TABLE} WHERE key = ?', stale)
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        row = self._row(self._connection(), key, now)
+        if row is None:
+            return default
+        value, accessed = row
+        if now - accessed >= ACCESS_RESOLUTION:
+            self._connection().execute(
+                f'UPDATE {TABLE} SET accessed = ? WHERE key = ?', (now, key)
+            )
+        return pickle.loads(value)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        self._write(
+            lambda connection: self._store(
+                connection, key, value, timeout, time.time()
+            )
+        )
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+
+        def add(connection):
+            now = time.time()
+            if self._row(connection, key, now) is not None:
+                return False
+            self._store(connection, key, value, timeout, now)
+            return True
+
+        return self._write(add)
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарно, в том числе между процессами."""
+        key = self._key(key, version)
+
+        def incr(connection):
+            now = time.time()
+            row = self._row(connection, key, now)
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            connection.execute(
+                f'UPDATE {TABLE} SET value = ?, size = ?, accessed = ? '
+                'WHERE key = ?',
+                (data, len(data), now, key),
+            )
+            return value
+
+        return self._write(incr)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+
+        def touch(connection):
+            return connection.execute(
+                f'UPDATE {TABLE} SET expires = ? '
+                'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), key, time.time()),
+            ).rowcount == 1
+
+        return self._write(touch)
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        self._write(
+            lambda connection: connection.execute(
+                f'DELETE FROM {TABLE} WHERE key = ?', (key,)
+            )
+        )
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return self._row(self._connection(), key, time.time()) is not None
+
+    def clear(self):
+        self._write(
+            lambda connection: connection.execute(f'DELETE FROM {TABLE}')
+        )
@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.routers import sync_replica
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в реплику для чтения; '
+        'с --interval повторяет копирование, пока не прервут.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            help='Повторять каждые столько секунд.',
+        )
+
+    def handle(self, *args, **options):
+        alias = settings.REPLICA_DATABASE
+        if alias is None:
+            raise CommandError(
+                'Реплика не настроена: задайте DB_REPLICA_NAME.'
+            )
+        source = settings.DATABASES['default']['NAME']
+        target = settings.DATABASES[alias]['NAME']
+        while True:
+            sync_replica(source, target)
+            self.stdout.write(f'{source} -> {target}')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,143 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from . import routers
+
+logger = logging.getLogger('core.performance')
+
+
+class QueryBudgetExceeded(Exception):
+    """Запрос к странице выполнил больше SQL-запросов, чем разрешено."""
+
+
+class QueryCollector:
+    """Считает SQL-запросы и их суммарное время через execute_wrapper."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest_duration = 0.0
+        self.slowest_sql = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.duration += duration
+            if duration >= self.slowest_duration:
+                self.slowest_duration = duration
+                self.slowest_sql = sql
+
+
+def view_name(request):
+    """Имя маршрута вида 'posts_page:index' или None."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None or match.url_name is None:
+        return None
+    if match.app_name:
+        return f'{match.app_name}:{match.url_name}'
+    return match.url_name
+
+
+class QueryInstrumentationMiddleware:
+    """Метрики запроса: число и время SQL, время рендера шаблона.
+
+    Пишет их в заголовок Server-Timing и в лог core.performance, а также
+    проверяет бюджет запросов из settings.QUERY_BUDGETS.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        collector = QueryCollector()
+        request._render_duration = 0.0
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(collector))
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        name = view_name(request)
+        response['Server-Timing'] = ', '.join((
+            'db;dur={:.1f};desc="{} queries"'.format(
+                collector.duration * 1000, collector.count
+            ),
+            'tpl;dur={:.1f}'.format(request._render_duration * 1000),
+            'total;dur={:.1f}'.format(total * 1000),
+        ))
+        logger.info(json.dumps({
+            'view': name,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': collector.count,
+            'db_ms': round(collector.duration * 1000, 1),
+            'render_ms': round(request._render_duration * 1000, 1),
+            'total_ms': round(total * 1000, 1),
+            'slowest_ms': round(collector.slowest_duration * 1000, 1),
+            'slowest_sql': (collector.slowest_sql or '')[:300],
+        }, ensure_ascii=False))
+        self.check_budget(name, collector.count)
+        return response
+
+    def process_template_response(self, request, response):
+        def finish(response):
+            request._render_duration += time.perf_counter() - start
+
+        start = time.perf_counter()
+        response.add_post_render_callback(finish)
+        return response
+
+    def check_budget(self, name, count):
+        budget = settings.QUERY_BUDGETS.get(name)
+        if budget is None or count <= budget:
+            return
+        message = f'{name}: {count} SQL-запросов при бюджете {budget}'
+        if settings.QUERY_BUDGET_RAISE:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+class ReplicaPinningMiddleware:
+    """Чтение своих записей при работе с репликой.
+
+    Если запрос что-то записал, ответ получает cookie со временем, до
+    которого этот клиент читает только из основной базы.
+    """
+
+    cookie_name = 'primary_until'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            until = float(request.COOKIES.get(self.cookie_name, 0))
+        except ValueError:
+            until = 0
+        routers.start_request(pinned=until > time.time())
+        try:
+            with connections[DEFAULT_DB_ALIAS].execute_wrapper(
+                routers.track_writes
+            ):
+                response = self.get_response(request)
+            wrote = routers.wrote()
+        finally:
+            routers.start_request()
+        if wrote and settings.REPLICA_DATABASE is not None:
+            response.set_cookie(
+                self.cookie_name,
+                str(int(time.time()) + settings.REPLICA_STICKY_SECONDS),
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+            )
+        return response
@@ -0,0 +1,109 @@
+"""Чтение из реплики, запись в основную базу.
+
+Страницы-списки и страницы постов (ReplicaReadMixin) читают из реплики
+settings.REPLICA_DATABASE, всё остальное и любая запись идут в основную
+базу. После записи запрос дочитывает из основной базы, а
+ReplicaPinningMiddleware ставит cookie, по которой этот же пользователь
+ещё REPLICA_STICKY_SECONDS секунд читает только из неё и видит свои
+изменения, даже если реплика отстаёт. Без реплики роутер ничего не меняет.
+
+Записью считается только выполненный INSERT, UPDATE или DELETE: их
+отмечает track_writes, а не выбор базы для записи, который Django делает
+и для чтений вроде get_or_create. Время последнего снимка реплики
+хранится в общем кэше: по нему кэши страниц понимают, видит ли реплика
+их изменения.
+"""
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from django.conf import settings
+from django.core.cache import cache
+
+REPLICA_SYNCED_KEY = 'replica_synced'
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+_local = threading.local()
+
+
+def start_request(pinned=False) -> None:
+    """Начинает запрос: по умолчанию чтение из основной базы."""
+    _local.replica = False
+    _local.pinned = pinned
+    _local.wrote = False
+
+
+def use_replica() -> None:
+    """Чтения текущего запроса можно отдавать реплике."""
+    _local.replica = True
+
+
+def wrote() -> bool:
+    """Была ли в текущем запросе запись в базу."""
+    return getattr(_local, 'wrote', False)
+
+
+def track_writes(execute, sql, params, many, context):
+    """execute_wrapper основной базы: отмечает запись в текущем запросе."""
+    if sql.lstrip()[:7].upper().startswith(WRITE_STATEMENTS):
+        _local.wrote = True
+    return execute(sql, params, many, context)
+
+
+def reads_from_replica() -> bool:
+    return (
+        settings.REPLICA_DATABASE is not None
+        and getattr(_local, 'replica', False)
+        and not getattr(_local, 'pinned', False)
+        and not wrote()
+    )
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if reads_from_replica():
+            return settings.REPLICA_DATABASE
+        return None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика — копия основной базы, связи между ними допустимы.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Схема попадает в реплику вместе с данными.
+        if db == settings.REPLICA_DATABASE:
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """Представление только для чтения: его запросы идут в реплику."""
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            use_replica()
+        return super().dispatch(request, *args, **kwargs)
+
+
+def replica_synced():
+    """Время начала последнего снимка реплики, в секундах Unix, или None."""
+    return cache.get(REPLICA_SYNCED_KEY)
+
+
+def sync_replica(source, target) -> None:
+    """Копирует файл SQLite source в target через backup API.
+
+    Копия согласована: это снимок базы на один момент, а в режиме WAL
+    копирование не мешает писать в source. Изменения, сделанные в ту же
+    секунду, что и снимок, могли в него не попасть, поэтому время снимка
+    округляется вниз.
+    """
+    started = int(time.time())
+    with closing(sqlite3.connect(source)) as primary:
+        with closing(sqlite3.connect(target)) as copy:
+            primary.backup(copy)
+    cache.set(REPLICA_SYNCED_KEY, started, None)
@@ -1,6 +1,30 @@
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import closing
 from http import HTTPStatus
+from unittest import mock
 
-from django.test import TestCase
+from django.conf import settings
+from django.core.cache import cache
+from django.db import OperationalError, connection, connections
+from django.template import engines
+from django.template.loaders.filesystem import Loader
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.cache import INDEX_FEED, bump_feed_version
+from posts.models import Post
+from users.models import User
+
+from . import routers, warmup
+from .cache import SQLiteCache
+from .middleware import QueryBudgetExceeded, ReplicaPinningMiddleware
 
 
 class ViewTestClass(TestCase):
@@ -10,3 +34,450 @@ class ViewTestClass(TestCase):
 
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, "core/404.html")
+
+
+class QueryInstrumentationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_server_timing_header(self):
+        """Ответ содержит заголовок Server-Timing с метриками SQL"""
+        with self.assertLogs('core.performance', level='INFO') as logs:
+            response = self.client.get(reverse('posts_page:index'))
+
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('tpl;dur=', response['Server-Timing'])
+        self.assertIn('"view": "posts_page:index"', logs.output[0])
+
+    @override_settings(
+        QUERY_BUDGETS={'posts_page:index': 0}, QUERY_BUDGET_RAISE=True
+    )
+    def test_query_budget_exceeded(self):
+        """Превышение бюджета запросов выбрасывает исключение"""
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('posts_page:index'))
+
+    @override_settings(QUERY_BUDGETS={'posts_page:index': 0})
+    def test_query_budget_exceeded_logged(self):
+        """Без QUERY_BUDGET_RAISE превышение бюджета пишется в лог"""
+        with self.assertLogs('core.performance', level='WARNING') as logs:
+            response = self.client.get(reverse('posts_page:index'))
+
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('posts_page:index', logs.output[0])
+
+
+class Clock:
+    """Время, которое растёт на секунду при каждом обращении."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        self.now += 1
+        return self.now
+
+
+def run_in_processes(target, count=1):
+    """Запускает target в отдельных процессах, как в разных воркерах."""
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=target) for _ in range(count)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        if process.exitcode:
+            raise AssertionError(f'Процесс завершился с {process.exitcode}')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_basic_operations(self):
+        """Запись, чтение, add, incr и удаление"""
+        cache = self.make_cache()
+        cache.set('key', {'value': 1})
+        self.assertEqual(cache.get('key'), {'value': 1})
+        self.assertFalse(cache.add('key', 'other'))
+        self.assertTrue(cache.add('counter', 1))
+        self.assertEqual(cache.incr('counter', 2), 3)
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+        cache.delete('key')
+        self.assertIsNone(cache.get('key'))
+        self.assertFalse(cache.has_key('key'))
+
+    def test_expired_entries_not_returned(self):
+        """Просроченная запись не читается и не мешает add"""
+        cache = self.make_cache()
+        cache.set('key', 'value', 0)
+        self.assertIsNone(cache.get('key'))
+        self.assertTrue(cache.add('key', 'new'))
+        self.assertEqual(cache.get('key'), 'new')
+
+    def test_visible_to_other_connections(self):
+        """Записи одного экземпляра видит другой с тем же файлом"""
+        self.make_cache().set('key', 'value')
+        self.assertEqual(self.make_cache().get('key'), 'value')
+
+    def test_least_recently_used_evicted(self):
+        """При превышении MAX_ENTRIES вытесняются давно не читавшиеся"""
+        cache = self.make_cache(MAX_ENTRIES=3)
+        with mock.patch('core.cache.time', Clock()):
+            for key in ('a', 'b', 'c'):
+                cache.set(key, key)
+            cache.get('a')
+            cache.set('d', 'd')
+        self.assertEqual(
+            [key for key in 'abcd' if cache.has_key(key)], ['a', 'c', 'd']
+        )
+
+    def test_size_limit(self):
+        """Суммарный объём значений не превышает MAX_SIZE"""
+        cache = self.make_cache(MAX_SIZE=2500)
+        with mock.patch('core.cache.time', Clock()):
+            for key in ('a', 'b', 'c'):
+                cache.set(key, b'x' * 1000)
+        self.assertEqual(
+            [key for key in 'abc' if cache.has_key(key)], ['b', 'c']
+        )
+
+    def test_running_totals(self):
+        """Число записей и их объём считаются триггерами без обхода таблицы"""
+        cache = self.make_cache()
+
+        def totals():
+            connection = cache._connection()
+            actual = connection.execute(
+                'SELECT count(*), total(size) FROM cache'
+            ).fetchone()
+            self.assertEqual(cache._stats(connection), actual)
+            return actual[0]
+
+        cache.set('key', 'value')
+        cache.set('key', 'другое значение')
+        cache.add('counter', 1)
+        cache.incr('counter', 10 ** 12)
+        self.assertEqual(totals(), 2)
+        cache.delete('key')
+        self.assertEqual(totals(), 1)
+        cache.clear()
+        self.assertEqual(totals(), 0)
+
+    def test_incr_atomic_across_processes(self):
+        """incr из разных процессов не теряет обновлений"""
+        cache = self.make_cache()
+        cache.set('counter', 0)
+
+        def increment():
+            worker_cache = self.make_cache()
+            for _ in range(50):
+                worker_cache.incr('counter')
+
+        run_in_processes(increment, count=4)
+        self.assertEqual(cache.get('counter'), 200)
+
+
+class SharedCacheInvalidationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Post.objects.create(
+            text='Тестовый пост',
+            author=User.objects.create_user(username='auth'),
+        )
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        settings = override_settings(CACHES={'default': {
+            'BACKEND': 'core.cache.SQLiteCache',
+            'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+        }})
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_invalidation_seen_by_other_workers(self):
+        """Сброс ленты в одном процессе виден странице в другом"""
+        url = reverse('posts_page:index')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertEqual(len(queries), 0)
+
+        run_in_processes(lambda: bump_feed_version(INDEX_FEED))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertGreater(len(queries), 0)
+
+
+class SQLiteTuningTest(SimpleTestCase):
+    """Соединения с файлом SQLite, настроенные сигналом connection_created."""
+
+    READERS = 4
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.name = os.path.join(directory, 'db.sqlite3')
+        with closing(self.open_database()) as writer:
+            writer.execute(
+                'CREATE TABLE comment (id INTEGER PRIMARY KEY, text TEXT)'
+            )
+
+    def open_database(self):
+        """Соединение sqlite3, открытое бэкендом Django, как в запросе."""
+        settings_dict = {**connection.settings_dict, 'NAME': self.name}
+        wrapper = type(connections['default'])(settings_dict, 'tuning')
+        wrapper.ensure_connection()
+        return wrapper.connection
+
+    def read_concurrently(self):
+        """Читает таблицу из нескольких потоков; возвращает результаты."""
+        results = []
+
+        def read():
+            start = time.perf_counter()
+            try:
+                with closing(self.open_database()) as reader:
+                    count = reader.execute(
+                        'SELECT count(*) FROM comment'
+                    ).fetchone()[0]
+            except (OperationalError, sqlite3.OperationalError) as error:
+                count = error
+            results.append((count, time.perf_counter() - start))
+
+        threads = [
+            threading.Thread(target=read) for _ in range(self.READERS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), self.READERS)
+        return results
+
+    def test_pragmas_applied(self):
+        """Новое соединение получает WAL и настройки из SQLITE_PRAGMAS"""
+        database = self.open_database()
+        self.addCleanup(database.close)
+
+        def pragma(name):
+            return database.execute(f'PRAGMA {name}').fetchone()[0]
+
+        self.assertEqual(pragma('journal_mode'), 'wal')
+        self.assertEqual(pragma('synchronous'), 1)
+        self.assertEqual(pragma('busy_timeout'), 5000)
+
+    def test_readers_not_blocked_by_writer(self):
+        """Пока идёт запись комментария, чтение не ждёт её завершения"""
+        writer = self.open_database()
+        self.addCleanup(writer.close)
+        writer.execute('BEGIN EXCLUSIVE')
+        writer.execute("INSERT INTO comment (text) VALUES ('новый')")
+
+        results = self.read_concurrently()
+        writer.execute('COMMIT')
+
+        for count, duration in results:
+            # Читатели видят снимок до записи и не ждут busy_timeout.
+            self.assertEqual(count, 0)
+            self.assertLess(duration, 1)
+        self.assertEqual(self.read_concurrently()[0][0], 1)
+
+    @override_settings(SQLITE_PRAGMAS={
+        'busy_timeout': 100, 'journal_mode': 'DELETE',
+    })
+    def test_rollback_journal_blocks_readers(self):
+        """Для сравнения: без WAL читатели ждут запись и получают ошибку"""
+        writer = self.open_database()
+        self.addCleanup(writer.close)
+        writer.execute('BEGIN EXCLUSIVE')
+        writer.execute("INSERT INTO comment (text) VALUES ('новый')")
+
+        results = self.read_concurrently()
+        writer.execute('ROLLBACK')
+
+        for count, _ in results:
+            self.assertIsInstance(
+                count, (OperationalError, sqlite3.OperationalError)
+            )
+
+
+# Реплика — та же тестовая база под своим именем: так видно, куда роутер
+# отправил чтение, а данные при этом одни и те же.
+@override_settings(REPLICA_DATABASE='default')
+class ReplicaRouterTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.reads = []
+        reads_from_replica = routers.reads_from_replica
+
+        def record():
+            self.reads.append(reads_from_replica())
+            return self.reads[-1]
+
+        patcher = mock.patch('core.routers.reads_from_replica', record)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, url, **kwargs):
+        self.reads.clear()
+        response = self.client.get(url, **kwargs)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response
+
+    def test_read_views_use_replica(self):
+        """Ленты и страница поста читают из реплики"""
+        urls = (
+            reverse('posts_page:index'),
+            reverse('posts_page:profile', args=(self.user.username,)),
+            reverse('posts_page:post_detail', args=(self.post.pk,)),
+            reverse('posts_page:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.get(url)
+                self.assertIn(True, self.reads)
+
+    def test_write_views_use_primary(self):
+        """Добавление комментария читает и пишет только в основную базу"""
+        self.reads.clear()
+        response = self.client.post(
+            reverse('posts_page:add_comment', args=(self.post.pk,)),
+            {'text': 'Комментарий'},
+        )
+
+        self.assertNotIn(True, self.reads)
+        self.assertIn(ReplicaPinningMiddleware.cookie_name, response.cookies)
+
+    def test_author_reads_own_writes(self):
+        """После записи автор какое-то время читает из основной базы"""
+        url = reverse('posts_page:post_detail', args=(self.post.pk,))
+        self.client.post(
+            reverse('posts_page:add_comment', args=(self.post.pk,)),
+            {'text': 'Комментарий'},
+        )
+
+        self.get(url)
+        self.assertNotIn(True, self.reads)
+
+        self.client.cookies[ReplicaPinningMiddleware.cookie_name] = str(
+            int(time.time()) - 1
+        )
+        self.get(url)
+        self.assertIn(True, self.reads)
+
+    def test_write_routing_without_write(self):
+        """Выбор базы для записи без самой записи не закрепляет основную"""
+        routers.start_request()
+        self.addCleanup(routers.start_request)
+        routers.use_replica()
+
+        routers.PrimaryReplicaRouter().db_for_write(Post)
+        self.assertFalse(routers.wrote())
+
+        with connection.execute_wrapper(routers.track_writes):
+            Post.objects.filter(pk=self.post.pk).update(text='Новый текст')
+        self.assertTrue(routers.wrote())
+
+    def test_lagging_replica_not_cached(self):
+        """Страницы из отстающей реплики не попадают в общие кэши"""
+        self.client.logout()
+        url = reverse('posts_page:index')
+        cache.set(routers.REPLICA_SYNCED_KEY, int(time.time()) - 60, None)
+        bump_feed_version(INDEX_FEED)
+
+        response = self.get(url)
+        self.assertNotIn('Last-Modified', response)
+        with self.assertNumQueries(3):
+            self.get(url)
+
+        cache.set(routers.REPLICA_SYNCED_KEY, int(time.time()) + 1, None)
+        fresh = self.get(url)
+        self.assertIn('Last-Modified', fresh)
+        self.assertNotEqual(fresh['ETag'], response['ETag'])
+        with self.assertNumQueries(0):
+            self.get(url)
+
+    @override_settings(REPLICA_DATABASE=None)
+    def test_without_replica(self):
+        """Без реплики всё читается из основной базы, cookie не ставится"""
+        response = self.client.post(
+            reverse('posts_page:add_comment', args=(self.post.pk,)),
+            {'text': 'Комментарий'},
+        )
+        self.get(reverse('posts_page:index'))
+
+        self.assertNotIn(
+            ReplicaPinningMiddleware.cookie_name, response.cookies
+        )
+        self.assertNotIn(True, self.reads)
+
+
+class SyncReplicaTest(SimpleTestCase):
+    def test_copies_database(self):
+        """Реплика получает текущее содержимое основной базы"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        source = os.path.join(directory, 'primary.sqlite3')
+        target = os.path.join(directory, 'replica.sqlite3')
+        with closing(sqlite3.connect(source)) as primary:
+            primary.execute('CREATE TABLE post (text TEXT)')
+            primary.execute("INSERT INTO post VALUES ('первый')")
+            primary.commit()
+            routers.sync_replica(source, target)
+            primary.execute("INSERT INTO post VALUES ('второй')")
+            primary.commit()
+            routers.sync_replica(source, target)
+
+        with closing(sqlite3.connect(target)) as replica:
+            rows = replica.execute('SELECT text FROM post').fetchall()
+        self.assertEqual(rows, [('первый',), ('второй',)])
+        self.assertLessEqual(routers.replica_synced(), time.time())
+
+
+@override_settings(TEMPLATES=[{
+    **settings.TEMPLATES[0],
+    'OPTIONS': {
+        **settings.TEMPLATES[0]['OPTIONS'],
+        'loaders': [(
+            'django.template.loaders.cached.Loader',
+            [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ],
+        )],
+    },
+}])
+class TemplateWarmupTest(SimpleTestCase):
+    def test_all_templates_compiled(self):
+        """Все шаблоны проекта и приложений компилируются заранее"""
+        engine = engines['django'].engine
+        names = set(warmup.template_names(engine))
+
+        self.assertEqual(warmup.warm_up(), len(names))
+        self.assertIn('posts/index.html', names)
+        self.assertIn('admin/base.html', names)
+
+    def test_no_disk_reads_after_warm_up(self):
+        """После прогрева шаблон не читается с диска"""
+        warmup.warm_up()
+
+        with mock.patch.object(
+            Loader, 'get_contents', side_effect=AssertionError
+        ):
+            engines['django'].get_template('posts/index.html')
@@ -1,5 +1,10 @@
+import operator
+from functools import reduce
+
 from django.contrib import admin
+from django.db.models import Q
 
+from . import search
 from .models import Comment, Group, Post
 
 
@@ -8,11 +13,43 @@ class PostAdmin(admin.ModelAdmin):
     list_editable = ("group",)
     search_fields = (
         "text",
-        "slug",
+        "group__slug",
     )
     list_filter = ("pub_date",)
     empty_value_display = "-пусто-"
 
+    # Эти поля ищутся по полнотекстовому индексу, остальные — через LIKE.
+    indexed_search_fields = ("text",)
+
+    def get_search_results(self, request, queryset, search_term):
+        """Ищет текст по полнотекстовому индексу вместо LIKE.
+
+        К найденному по индексу добавляются посты, у которых совпали
+        остальные поля search_fields (слаг группы).
+        """
+        if not search.is_available() or not search.match_expression(
+            search_term
+        ):
+            return super().get_search_results(request, queryset, search_term)
+        found = search.filter_matching(queryset, search_term)
+        other_fields = [
+            field
+            for field in self.get_search_fields(request)
+            if field not in self.indexed_search_fields
+        ]
+        if other_fields:
+            condition = Q()
+            for bit in search_term.split():
+                condition &= reduce(
+                    operator.or_,
+                    (
+                        Q(**{f"{field}__icontains": bit})
+                        for field in other_fields
+                    ),
+                )
+            found |= queryset.filter(condition)
+        return found, False
+
 
 class GroupClass(admin.ModelAdmin):
     list_display = ("pk", "title", "slug", "description")
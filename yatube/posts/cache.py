@@ -0,0 +1,167 @@
+"""Версии лент для инвалидации кэша.
+
+У каждой ленты (главная, группа, профиль, пост) есть номер версии в кэше.
+Сигналы моделей увеличивают его при любом изменении, поэтому фрагменты,
+ключ которых включает версию, можно хранить часами: после изменения
+они просто перестают находиться.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+
+from core import routers
+
+# Версия, общая для всех лент: меняется, например, вместе с группами,
+# ссылки на которые есть в каждой ленте.
+ALL_FEEDS = 'all'
+INDEX_FEED = 'index'
+
+
+def feed_key(name, pk=None) -> str:
+    """Имя ленты: 'index', 'group:1', 'profile:5', 'post:10'."""
+    if pk is None:
+        return name
+    return f'{name}:{pk}'
+
+
+def _version_key(feed) -> str:
+    return f'feed_version:{feed}'
+
+
+def _changed_key(feed) -> str:
+    return f'feed_changed:{feed}'
+
+
+def get_feed_version(feed) -> int:
+    key = _version_key(feed)
+    version = cache.get(key)
+    if version is None:
+        # После вытеснения ключа версия начинается с текущего времени,
+        # чтобы не совпасть с версией уже закэшированных фрагментов.
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def get_feed_version_map(feeds) -> dict:
+    """Версии нескольких лент одним обращением к кэшу: {лента: версия}."""
+    keys = {_version_key(feed): feed for feed in feeds}
+    found = cache.get_many(keys)
+    return {
+        feed: found[key] if key in found else get_feed_version(feed)
+        for key, feed in keys.items()
+    }
+
+
+def get_feed_versions(feed) -> str:
+    """Составная версия ленты для ключей кэша."""
+    return '{}.{}'.format(
+        get_feed_version(ALL_FEEDS), get_feed_version(feed)
+    )
+
+
+def get_feed_changed(feed) -> int:
+    """Время последнего изменения ленты, в секундах Unix."""
+    key = _changed_key(feed)
+    changed = cache.get(key)
+    if changed is None:
+        # Время неизвестно — считаем, что лента изменилась только что.
+        cache.add(key, int(time.time()), None)
+        changed = cache.get(key)
+    return changed
+
+
+def bump_feed_version(*feeds) -> None:
+    now = int(time.time())
+    for feed in feeds:
+        try:
+            cache.incr(_version_key(feed))
+        except ValueError:
+            get_feed_version(feed)
+        cache.set(_changed_key(feed), now, None)
+
+
+def replica_lags(feeds) -> bool:
+    """Может ли запрос читать из реплики, которая не видит изменений лент.
+
+    Так бывает, если лента изменилась после начала последнего снимка
+    реплики. Версия ленты к этому времени уже новая, поэтому то, что
+    отрендерено из такой реплики, нельзя класть в общие кэши под этой
+    версией: устаревший HTML отдавался бы часами.
+    """
+    if not routers.reads_from_replica():
+        return False
+    synced = routers.replica_synced()
+    if synced is None:
+        return True
+    return any(
+        get_feed_changed(feed) >= synced for feed in (ALL_FEEDS, *feeds)
+    )
+
+
+def _page_key(request) -> str:
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'page:{path}'
+
+
+def _page_versions(feeds) -> list:
+    return [get_feed_version(feed) for feed in (ALL_FEEDS, *feeds)]
+
+
+def get_cached_page(request):
+    """Сохранённый ответ, если ни одна из его лент с тех пор не менялась."""
+    entry = cache.get(_page_key(request))
+    if entry is None:
+        return None
+    feeds, versions, response = entry
+    if _page_versions(feeds) != versions:
+        return None
+    return response
+
+
+def cache_page(request, response, feeds, timeout) -> None:
+    """Сохраняет ответ вместе с текущими версиями лент, от которых он зависит.
+
+    Отдельно сбрасывать страницы не нужно: сигналы увеличивают версии
+    лент, и get_cached_page перестаёт отдавать устаревший ответ.
+    """
+    cache.set(
+        _page_key(request), (feeds, _page_versions(feeds), response), timeout
+    )
+
+
+def page_validators(request, feeds, state=()):
+    """ETag и Last-Modified страницы без её рендера и без запросов к базе.
+
+    ETag зависит от адреса, пользователя, версий лент страницы и от
+    state — того, что представление знает о странице читателя. У
+    вошедшего в ETag входит и CSRF-токен: после нового входа он другой,
+    и страница с формой не отдаётся из кэша браузера со старым токеном.
+    Last-Modified — время последнего изменения лент.
+
+    Пока реплика может не видеть изменений лент, ETag содержит время её
+    снимка, а Last-Modified нет: после обновления реплики браузер получит
+    страницу заново, а не 304 на отрендеренную из старых данных.
+    """
+    lags = replica_lags(feeds)
+    feeds = (ALL_FEEDS, *feeds)
+    secret = ''
+    if request.user.is_authenticated:
+        # Токен создаётся сразу, иначе страница с формой получила бы
+        # его только при рендере, уже после расчёта ETag.
+        get_token(request)
+        secret = request.META['CSRF_COOKIE']
+    state = '{}|{}|{}|{}|{}|{}'.format(
+        request.get_full_path(),
+        request.user.pk or '',
+        secret,
+        _page_versions(feeds[1:]),
+        state,
+        'replica:{}'.format(routers.replica_synced()) if lags else '',
+    )
+    etag = 'W/"{}"'.format(hashlib.md5(state.encode()).hexdigest())
+    if lags:
+        return etag, None
+    return etag, max(get_feed_changed(feed) for feed in feeds)
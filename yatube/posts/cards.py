@@ -0,0 +1,67 @@
+"""Быстрый рендер карточек постов в лентах.
+
+Карточка (posts/post.html) не подключается через {% include %} на каждой
+итерации цикла: тег {% post_card %} берёт готовый HTML из кэша, причём
+карточки всей страницы — одним get_many. Ключ карточки содержит версии
+лент поста и профиля автора, которые сигналы увеличивают при изменении
+поста, его картинки или имени автора, поэтому устаревшая карточка просто
+перестаёт находиться. Недостающие карточки рендерятся уже
+скомпилированным шаблоном и кэшируются пачкой — кроме тех, что
+отрендерены из отстающей реплики.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.template import Context
+from django.template.loader import get_template
+
+from .cache import (ALL_FEEDS, feed_key, get_feed_version_map,
+                    replica_lags)
+
+CARD_TEMPLATE = 'posts/post.html'
+
+
+def _feeds(post):
+    return feed_key('post', post.pk), feed_key('profile', post.author_id)
+
+
+def _card_key(post, versions) -> str:
+    return 'post_card:{}:{}'.format(
+        post.pk,
+        '.'.join(
+            str(versions[feed]) for feed in (ALL_FEEDS, *_feeds(post))
+        ),
+    )
+
+
+def render_cards(posts, request=None) -> dict:
+    """HTML карточек постов: {pk: html}.
+
+    Карточки берутся из кэша; недостающие рендерятся и сохраняются.
+    """
+    posts = list(posts)
+    versions = get_feed_version_map(
+        {ALL_FEEDS, *(feed for post in posts for feed in _feeds(post))}
+    )
+    keys = {post.pk: _card_key(post, versions) for post in posts}
+    cards = cache.get_many(keys.values())
+    missing = [post for post in posts if keys[post.pk] not in cards]
+    if missing:
+        template = get_template(CARD_TEMPLATE).template
+        # Все карточки рендерятся в одном контексте и без
+        # контекст-процессоров: карточке они не нужны. Копии картинок
+        # всей пачки тег {% picture %} читает одним запросом по page_obj.
+        context = Context({'page_obj': missing, 'request': request})
+        rendered = {}
+        for post in missing:
+            with context.push(post=post):
+                rendered[keys[post.pk]] = template.render(context)
+        cards.update(rendered)
+        cache.set_many(
+            {
+                keys[post.pk]: rendered[keys[post.pk]]
+                for post in missing
+                if not replica_lags(_feeds(post))
+            },
+            settings.FEED_CACHE_TIMEOUT,
+        )
+    return {pk: cards[key] for pk, key in keys.items()}
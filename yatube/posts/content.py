@@ -0,0 +1,273 @@
+"""Потоковые выгрузка и загрузка контента.
+
+Формат записей тот же, что у dumpdata/loaddata: {"model", "pk", "fields"},
+в виде JSON-массива или NDJSON (по объекту в строке). В отличие от
+loaddata файл читается по одной записи, а объекты сохраняются через
+bulk_create пачками. Вся загрузка — одна транзакция: она проходит целиком
+или не меняет базу, например если pk записи уже занят (существующие
+объекты не обновляются и не пропускаются). bulk_create не отправляет
+сигналы, поэтому счётчики, ленты подписки, поисковый индекс и версии кэша
+при загрузке не трогаются и пересчитываются один раз в конце.
+"""
+import json
+from collections import Counter, defaultdict
+
+from django.core import serializers
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.serializers.python import Serializer
+from django.db import connections, router, transaction
+
+from users.models import Profile, User
+
+from . import feed, search
+from .cache import ALL_FEEDS, bump_feed_version
+from .counters import rebuild_counters
+from .models import Comment, FeedEntry, Follow, Group, ImageVariant, Post
+
+CHUNK_SIZE = 64 * 1024
+
+# Что выгружается, в порядке зависимостей.
+CONTENT_MODELS = (User, Group, Post, Comment, Follow)
+# Связи m2m, которые выгружаются вместе с объектами модели.
+PREFETCH = {User: ('groups', 'user_permissions')}
+# Записи, которые не загружаются: их создают миграции и сам сайт.
+SKIPPED_MODELS = {
+    'contenttypes.contenttype',
+    'auth.permission',
+    'sessions.session',
+    'thumbnail.kvstore',
+    FeedEntry._meta.label_lower,
+    ImageVariant._meta.label_lower,
+    Profile._meta.label_lower,
+}
+
+
+def _read(stream, buffer, chunk_size):
+    """Дочитывает чанк; возвращает (буфер без пробелов в начале, eof)."""
+    chunk = stream.read(chunk_size)
+    return (buffer + chunk).lstrip(), not chunk
+
+
+def _open_array(stream, chunk_size):
+    """Читает до «[» в начале массива; возвращает (остаток буфера, eof)."""
+    buffer, eof = '', False
+    while not buffer:
+        if eof:
+            raise ValueError('JSON-массив оборвался.')
+        buffer, eof = _read(stream, buffer, chunk_size)
+    if not buffer.startswith('['):
+        raise ValueError('Ожидался JSON-массив.')
+    return buffer[1:], eof
+
+
+def _decode_item(decoder, buffer, eof):
+    """(элемент, остаток) из начала буфера; None — элемент ещё не дочитан."""
+    try:
+        item, end = decoder.raw_decode(buffer)
+    except json.JSONDecodeError:
+        if eof:
+            raise
+        return None
+    return item, buffer[end:]
+
+
+def iter_json_array(stream, chunk_size=CHUNK_SIZE):
+    """Элементы JSON-массива по одному, без чтения файла целиком."""
+    decoder = json.JSONDecoder()
+    buffer, eof = _open_array(stream, chunk_size)
+    while True:
+        buffer = buffer.lstrip()
+        if buffer.startswith(','):
+            buffer = buffer[1:]
+            continue
+        if buffer.startswith(']'):
+            return
+        decoded = buffer and _decode_item(decoder, buffer, eof)
+        if decoded:
+            item, buffer = decoded
+            yield item
+            continue
+        if eof:
+            raise ValueError('JSON-массив оборвался.')
+        buffer, eof = _read(stream, buffer, chunk_size)
+
+
+def iter_ndjson(stream):
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_records(stream, format_):
+    if format_ == 'ndjson':
+        return iter_ndjson(stream)
+    return iter_json_array(stream)
+
+
+class ImportBatches:
+    """Копит объекты по моделям и сохраняет их пачками."""
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.objects = defaultdict(list)
+        self.m2m = defaultdict(list)
+        self.saved = Counter()
+
+    def add(self, deserialized):
+        model = type(deserialized.object)
+        self.objects[model].append(deserialized.object)
+        for name, pks in (deserialized.m2m_data or {}).items():
+            self.m2m[model].append((deserialized.object.pk, name, pks))
+        if len(self.objects[model]) >= self.batch_size:
+            self.flush(model)
+
+    def flush(self, model):
+        objects, m2m = self.objects.pop(model, []), self.m2m.pop(model, [])
+        if not objects:
+            return
+        # Размер одного INSERT выбирает бэкенд: у SQLite он ограничен.
+        model._base_manager.bulk_create(objects)
+        self._save_m2m(model, m2m)
+        self.saved[model] += len(objects)
+
+    def _save_m2m(self, model, m2m):
+        rows = defaultdict(list)
+        for pk, name, related_pks in m2m:
+            field = model._meta.get_field(name)
+            through = field.remote_field.through
+            source = field.m2m_field_name()
+            target = field.m2m_reverse_field_name()
+            rows[through].extend(
+                through(**{f'{source}_id': pk, f'{target}_id': related_pk})
+                for related_pk in related_pks
+            )
+        for through, objects in rows.items():
+            through._base_manager.bulk_create(objects)
+
+    def flush_all(self):
+        for model in list(self.objects):
+            self.flush(model)
+
+
+def rebuild_derived(batch_size) -> None:
+    """Пересчитывает всё, что при загрузке делали бы сигналы."""
+    rebuild_counters(batch_size)
+    feed.rebuild()
+    search.rebuild_index()
+    bump_feed_version(ALL_FEEDS)
+
+
+def _reset_sequences(models):
+    for using in {router.db_for_write(model) for model in models}:
+        connection = connections[using]
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def import_content(stream, format_='json', batch_size=1000):
+    """Загружает записи из stream.
+
+    Возвращает число сохранённых объектов по моделям и число пропущенных
+    записей служебных моделей. Внешние ключи проверяются один раз в конце,
+    поэтому порядок записей в файле не важен. Загрузка идёт в одной
+    транзакции: запись с уже занятым pk вызывает IntegrityError, и база
+    остаётся прежней.
+    """
+    batches = ImportBatches(batch_size)
+    skipped = Counter()
+
+    def content_records():
+        for record in read_records(stream, format_):
+            if record.get('model', '').lower() in SKIPPED_MODELS:
+                skipped[record['model']] += 1
+            else:
+                yield record
+
+    using = router.db_for_write(Post)
+    connection = connections[using]
+    # SQLite не отключает проверку внешних ключей внутри транзакции,
+    # поэтому она отключается до неё.
+    with connection.constraint_checks_disabled():
+        with transaction.atomic(using=using):
+            for deserialized in serializers.deserialize(
+                'python', content_records(), ignorenonexistent=True
+            ):
+                batches.add(deserialized)
+            batches.flush_all()
+            models = list(batches.saved)
+            connection.check_constraints(
+                table_names=[model._meta.db_table for model in models]
+            )
+            _reset_sequences(models)
+            rebuild_derived(batch_size)
+    return batches.saved, skipped
+
+
+class StreamingSerializer(Serializer):
+    """Сериализатор, который пишет каждый объект сразу, а не копит список."""
+
+    def __init__(self, write):
+        super().__init__()
+        self.write = write
+
+    def end_object(self, obj):
+        self.write(self.get_dump_object(obj))
+        self._current = None
+
+    def handle_m2m_field(self, obj, field):
+        """Связи m2m берутся из prefetch_related, без запроса на объект.
+
+        В Django 2.2 базовый сериализатор читает их через iterator(),
+        который prefetch_related не использует.
+        """
+        if self.use_natural_foreign_keys:
+            return super().handle_m2m_field(obj, field)
+        if field.remote_field.through._meta.auto_created:
+            self._current[field.name] = [
+                self._value_from_field(related, related._meta.pk)
+                for related in getattr(obj, field.name).all()
+            ]
+
+
+def _in_chunks(queryset, chunk_size):
+    """Объекты queryset по возрастанию pk, пачками по chunk_size.
+
+    В отличие от iterator(), каждая пачка выполняет prefetch_related.
+    """
+    queryset = queryset.order_by('pk')
+    chunk = list(queryset[:chunk_size])
+    while chunk:
+        yield from chunk
+        chunk = list(queryset.filter(pk__gt=chunk[-1].pk)[:chunk_size])
+
+
+def export_content(stream, format_='json', chunk_size=2000, models=None):
+    """Выгружает контент в stream; возвращает число объектов по моделям."""
+    exported = Counter()
+    first = True
+
+    def write(data, model):
+        nonlocal first
+        text = json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+        if format_ == 'ndjson':
+            stream.write(text + '\n')
+        else:
+            stream.write(('[\n' if first else ',\n') + text)
+        first = False
+        exported[model] += 1
+
+    for model in models or CONTENT_MODELS:
+        exported[model] = 0
+        serializer = StreamingSerializer(
+            lambda data, model=model: write(data, model)
+        )
+        queryset = model._base_manager.prefetch_related(
+            *PREFETCH.get(model, ())
+        )
+        serializer.serialize(_in_chunks(queryset, chunk_size))
+    if format_ != 'ndjson':
+        stream.write('[]\n' if first else '\n]\n')
+    return exported
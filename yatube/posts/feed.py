@@ -0,0 +1,149 @@
+"""Материализованная лента подписки (fan-out on write).
+
+Новый пост раскладывается в FeedEntry каждого подписчика автора, поэтому
+чтение /follow/ — выборка по индексу (user, -pub_date). Посты авторов
+с очень большим числом подписчиков не раскладываются, а подтягиваются
+при чтении (гибридная схема pull). Такие авторы отмечены флагом
+Profile.feed_pull: он переключается вместе с числом подписчиков, и
+чтению не нужно их считать.
+
+При подписке в ленту копируются только последние FEED_BACKFILL_SIZE
+постов автора, поэтому более старые посты обычного автора в ленте
+подписки не видны (они есть в его профиле), а посты популярного
+подтягиваются все. Так подписка на автора с тысячами постов стоит
+ограниченного числа вставок.
+"""
+from django.conf import settings
+from django.db.models import Q
+
+from users.models import Profile
+
+from .models import FeedEntry, Follow, Post
+
+
+def is_popular(author_id) -> bool:
+    """Автор слишком популярен для раскладки постов по лентам."""
+    return Profile.objects.filter(user_id=author_id, feed_pull=True).exists()
+
+
+def popular_authors(user):
+    """id популярных авторов, на которых подписан пользователь."""
+    return Profile.objects.filter(
+        feed_pull=True,
+        user_id__in=Follow.objects.filter(user=user).values('author'),
+    ).values_list('user_id', flat=True)
+
+
+def _fill(user_ids, author_id, posts) -> None:
+    """Добавляет посты posts [(pk, pub_date)] в ленты user_ids."""
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for user_id in user_ids
+            for post_id, pub_date in posts
+        ),
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+def _recent_posts(author_id) -> list:
+    return list(
+        Post.objects.filter(author_id=author_id).values_list(
+            'pk', 'pub_date'
+        )[:settings.FEED_BACKFILL_SIZE]
+    )
+
+
+def _followers(author_id):
+    return Follow.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True
+    )
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_popular(post.author_id):
+        return
+    _fill(
+        _followers(post.author_id).iterator(),
+        post.author_id,
+        [(post.pk, post.pub_date)],
+    )
+
+
+def backfill(follow):
+    """Добавляет в ленту последние FEED_BACKFILL_SIZE постов автора."""
+    if is_popular(follow.author_id):
+        return
+    _fill([follow.user_id], follow.author_id, _recent_posts(follow.author_id))
+
+
+def trim(follow):
+    """Убирает из ленты посты автора после отписки."""
+    FeedEntry.objects.filter(
+        user_id=follow.user_id, author_id=follow.author_id
+    ).delete()
+
+
+def update_pull(author_id) -> None:
+    """Переключает Profile.feed_pull по числу подписчиков автора.
+
+    Пока автор был популярен, его посты по лентам не раскладывались,
+    поэтому, когда он перестаёт быть популярным, последние посты
+    добавляются в ленты всех подписчиков.
+    """
+    row = (
+        Profile.objects.filter(user_id=author_id)
+        .values_list('follower_count', 'feed_pull')
+        .first()
+    )
+    if row is None:
+        return
+    follower_count, pull = row
+    popular = follower_count > settings.FEED_FANOUT_LIMIT
+    if popular == pull:
+        return
+    # Условное обновление: флаг переключает только один из параллельных
+    # запросов, и подписчики получают посты один раз.
+    switched = Profile.objects.filter(
+        user_id=author_id, feed_pull=pull
+    ).update(feed_pull=popular)
+    if switched and not popular:
+        _fill(
+            _followers(author_id).iterator(),
+            author_id,
+            _recent_posts(author_id),
+        )
+
+
+def follow_posts(user):
+    """Посты ленты подписки пользователя."""
+    popular = list(popular_authors(user))
+    if not popular:
+        # Сортировка по копии даты в FeedEntry читает ленту прямо
+        # из индекса (user, -pub_date, author), без сортировки постов.
+        return Post.objects.filter(feed_entries__user=user).order_by(
+            '-feed_entries__pub_date', 'feed_entries__author'
+        )
+    entries = FeedEntry.objects.filter(user=user).values('post')
+    return Post.objects.filter(Q(pk__in=entries) | Q(author__in=popular))
+
+
+def rebuild() -> None:
+    """Заново раскладывает ленты по всем подпискам, например после импорта.
+
+    Флаги Profile.feed_pull выставляются по уже пересчитанным счётчикам
+    подписчиков.
+    """
+    limit = settings.FEED_FANOUT_LIMIT
+    Profile.objects.filter(follower_count__gt=limit).update(feed_pull=True)
+    Profile.objects.filter(follower_count__lte=limit).update(feed_pull=False)
+    FeedEntry.objects.all().delete()
+    for follow in Follow.objects.iterator():
+        backfill(follow)
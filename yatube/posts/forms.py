@@ -27,3 +27,13 @@ class CommentForm(forms.ModelForm):
                 }
             ),
         }
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(
+        label="Поиск",
+        max_length=200,
+        widget=forms.TextInput(
+            attrs={"class": "form-control", "placeholder": "Что найти?"}
+        ),
+    )
@@ -0,0 +1,100 @@
+"""Размеры, основной цвет и заглушка картинки поста.
+
+Всё это считается один раз после загрузки, в очереди миниатюр, и
+хранится в полях поста. Лента берёт размеры и заглушку из строки поста
+и при рендере не открывает файлы. Заглушка — крошечная копия картинки
+в data:-URI с тем же кадрированием, что и миниатюра: браузер растягивает
+её до размера картинки, и она выглядит размытой, пока грузится оригинал.
+"""
+import base64
+import logging
+from io import BytesIO
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+from .cache import INDEX_FEED, bump_feed_version, feed_key
+from .models import Post
+from .storage import content_storage
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('image_width', 'image_height', 'image_color', 'image_placeholder')
+# Основной цвет — самый частый из стольких цветов уменьшенной картинки.
+PALETTE_COLORS = 8
+
+
+def reset(post) -> None:
+    """Забывает сведения о прежней картинке поста."""
+    post.image_width = post.image_height = None
+    post.image_color = post.image_placeholder = ''
+
+
+def _dominant_color(image) -> str:
+    small = image.copy()
+    small.thumbnail((64, 64))
+    palette = small.quantize(colors=PALETTE_COLORS)
+    _, index = max(palette.getcolors())
+    red, green, blue = palette.getpalette()[index * 3:index * 3 + 3]
+    return f'#{red:02x}{green:02x}{blue:02x}'
+
+
+def _placeholder(image) -> str:
+    ratio_width, ratio_height = settings.IMAGE_VARIANT_RATIO
+    width = settings.IMAGE_PLACEHOLDER_WIDTH
+    height = max(round(width * ratio_height / ratio_width), 1)
+    buffer = BytesIO()
+    ImageOps.fit(image, (width, height), Image.LANCZOS).save(
+        buffer, format='WEBP', quality=50
+    )
+    data = base64.b64encode(buffer.getvalue()).decode('ascii')
+    return f'data:image/webp;base64,{data}'
+
+
+def describe(name):
+    """Сведения о картинке name для полей поста; None, если не открылась."""
+    try:
+        with content_storage.open(name) as file:
+            image = ImageOps.exif_transpose(Image.open(file))
+            image = image.convert('RGB')
+    except (OSError, ValueError):
+        logger.exception('Не удалось открыть картинку %s', name)
+        return None
+    return {
+        'image_width': image.width,
+        'image_height': image.height,
+        'image_color': _dominant_color(image),
+        'image_placeholder': _placeholder(image),
+    }
+
+
+def measure(name, force=False) -> int:
+    """Заполняет сведения о картинке name у постов, где их нет.
+
+    Одинаковые картинки хранятся одним файлом, поэтому сведения,
+    посчитанные для одного поста, подходят и остальным. Возвращает число
+    обновлённых постов.
+    """
+    posts = Post.objects.filter(image=name)
+    if not force:
+        posts = posts.filter(image_width__isnull=True)
+    rows = list(posts.values_list('pk', 'author_id', 'group_id'))
+    if not rows:
+        return 0
+    meta = None if force else (
+        Post.objects.filter(image=name, image_width__isnull=False)
+        .values(*FIELDS)
+        .first()
+    )
+    meta = meta or describe(name)
+    if meta is None:
+        return 0
+    Post.objects.filter(pk__in=[pk for pk, _, _ in rows]).update(**meta)
+    # update() не отправляет сигналы, ленты сбрасываются здесь.
+    feeds = {INDEX_FEED}
+    for pk, author_id, group_id in rows:
+        feeds.update((feed_key('post', pk), feed_key('profile', author_id)))
+        if group_id is not None:
+            feeds.add(feed_key('group', group_id))
+    bump_feed_version(*feeds)
+    return len(rows)
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from posts.cache import ALL_FEEDS, bump_feed_version
+from posts.models import Post
+from posts.storage import is_content_name
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов, загруженные до хранения по хэшу, '
+        'в имена по содержимому: одинаковые файлы сливаются в один.'
+    )
+
+    def handle(self, *args, **options):
+        storage = Post.image.field.storage
+        names = [
+            name
+            for name in Post.objects.exclude(image='')
+            .order_by()
+            .values_list('image', flat=True)
+            .distinct()
+            if not is_content_name(name)
+        ]
+        stored = set()
+        for name in names:
+            if not storage.exists(name):
+                self.stderr.write(f'Нет файла {name}, пропущен.')
+                continue
+            with storage.open(name) as file:
+                new_name = storage.save(name, file)
+            Post.objects.filter(image=name).update(image=new_name)
+            storage.delete(name)
+            stored.add(new_name)
+        # Адреса картинок есть на закэшированных страницах всех лент.
+        bump_feed_version(ALL_FEEDS)
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено файлов: {len(names)}, '
+            f'после слияния одинаковых: {len(stored)}.'
+        ))
@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts.content import export_content
+
+from .import_content import detect_format
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково выгружает пользователей, группы, посты, комментарии и '
+        'подписки в JSON или NDJSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл выгрузки или «-» для stdout.')
+        parser.add_argument(
+            '--format',
+            choices=('json', 'ndjson'),
+            help='Формат файла; по умолчанию — по расширению.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Сколько строк читать из базы за один раз.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format_ = detect_format(path, options['format'])
+        if path == '-':
+            exported = export_content(
+                sys.stdout, format_, options['chunk_size']
+            )
+        else:
+            with open(path, 'w', encoding='utf-8') as stream:
+                exported = export_content(
+                    stream, format_, options['chunk_size']
+                )
+            for model, count in exported.items():
+                self.stdout.write(f'{model._meta.label}: {count}')
+            self.stdout.write(self.style.SUCCESS('Контент выгружен.'))
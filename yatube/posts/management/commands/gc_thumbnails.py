@@ -0,0 +1,53 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from posts import media_gc
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки, миниатюры и адаптивные копии картинок, которых '
+        'нет ни в одном посте, и файлы миниатюр без записей в хранилище '
+        'ключей, затем вытесняет давно не использовавшиеся миниатюры сверх '
+        'бюджета; с --interval повторяет сборку, пока не прервут.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-size',
+            type=int,
+            default=settings.THUMBNAIL_CACHE_MAX_SIZE,
+            help='Бюджет каталога миниатюр в байтах; 0 — без ограничения.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=media_gc.BATCH_SIZE,
+            help='Сколько записей и файлов проверять за один запрос.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            help='Повторять каждые столько секунд.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            report = media_gc.collect(
+                options['max_size'], options['batch_size']
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'Миниатюр без постов: {report.orphan_thumbnails}, '
+                f'файлов без записей: {report.unknown_files}, '
+                f'вытеснено по бюджету: {report.evicted}, '
+                f'копий без постов: {report.orphan_variants}, '
+                f'картинок без постов: {report.orphan_images}; '
+                'освобождено: '
+                f'{filesizeformat(report.bytes_reclaimed)}.'
+            ))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from posts import variants
+from posts.cache import ALL_FEEDS, bump_feed_version
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Режет адаптивные копии (ширины и форматы для srcset) картинок '
+        'постов, у которых их ещё нет.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Нарезать заново и готовые копии.',
+        )
+
+    def handle(self, *args, **options):
+        names = (
+            Post.objects.exclude(image='')
+            .order_by()
+            .values_list('image', flat=True)
+            .distinct()
+        )
+        created = 0
+        for name in names.iterator():
+            created += len(variants.generate(name, force=options['force']))
+        # Страницы лент в кэше ещё ссылаются на одиночные миниатюры.
+        bump_feed_version(ALL_FEEDS)
+        self.stdout.write(self.style.SUCCESS(f'Создано копий: {created}.'))
@@ -0,0 +1,62 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from posts.content import import_content
+
+
+def detect_format(path, format_):
+    if format_:
+        return format_
+    if path.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return 'json'
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково загружает посты, группы, комментарии, подписки и '
+        'пользователей из JSON или NDJSON, затем пересчитывает счётчики, '
+        'ленты и поисковый индекс. Загрузка идёт целиком или никак: '
+        'если pk записи уже занят, база не меняется.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл выгрузки или «-» для stdin.')
+        parser.add_argument(
+            '--format',
+            choices=('json', 'ndjson'),
+            help='Формат файла; по умолчанию — по расширению.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько объектов одной модели копить перед сохранением.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format_ = detect_format(path, options['format'])
+        try:
+            if path == '-':
+                saved, skipped = import_content(
+                    sys.stdin, format_, options['batch_size']
+                )
+            else:
+                with open(path, encoding='utf-8') as stream:
+                    saved, skipped = import_content(
+                        stream, format_, options['batch_size']
+                    )
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+        except IntegrityError as error:
+            raise CommandError(
+                f'Загрузка отменена, база не изменена: {error}'
+            )
+        for model, count in saved.items():
+            self.stdout.write(f'{model._meta.label}: {count}')
+        for label, count in skipped.items():
+            self.stdout.write(f'{label}: пропущено {count}')
+        self.stdout.write(self.style.SUCCESS('Контент загружен.'))
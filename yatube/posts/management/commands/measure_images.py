@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from posts import image_meta
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Запоминает в постах размеры, основной цвет и заглушку картинок, '
+        'у которых их ещё нет.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Описать заново и уже описанные картинки.',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='')
+        if not options['force']:
+            posts = posts.filter(image_width__isnull=True)
+        names = list(
+            posts.order_by().values_list('image', flat=True).distinct()
+        )
+        updated = sum(
+            image_meta.measure(name, force=options['force']) for name in names
+        )
+        self.stdout.write(self.style.SUCCESS(f'Обновлено постов: {updated}.'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики постов, комментариев и подписок, '
+        'исправляя расхождения с данными.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько строк пересчитывать за одну транзакцию.',
+        )
+
+    def handle(self, *args, **options):
+        updated = rebuild_counters(options['batch_size'])
+        for model, rows in updated.items():
+            self.stdout.write(f'{model._meta.verbose_name_plural}: {rows}')
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import is_available, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Заново заполняет полнотекстовый индекс постов и комментариев.'
+
+    def handle(self, *args, **options):
+        if not is_available():
+            self.stdout.write('Полнотекстовый индекс есть только в SQLite.')
+            return
+        rebuild_index()
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс перестроен.'))
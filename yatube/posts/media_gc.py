@@ -0,0 +1,271 @@
+"""Сборка мусора в хранилище миниатюр и адаптивных копий.
+
+sorl-thumbnail сам ничего не удаляет: миниатюры в media/cache и записи о
+них в хранилище ключей остаются и после удаления поста или замены его
+картинки. Сигналы posts.signals удаляют миниатюры картинки, как только на
+неё перестаёт ссылаться последний пост, а collect (команда gc_thumbnails)
+подчищает то, что накопилось раньше или мимо сигналов, в том числе
+недавно загруженные картинки, которые сигналы не удаляют, и держит объём
+media/cache в пределах бюджета, вытесняя давно не использовавшиеся файлы.
+
+Хранилище ключей и каталог обходятся порциями, целиком в память не
+читаются. Ключи читаются прямо из таблицы cached_db-хранилища
+(THUMBNAIL_KVSTORE по умолчанию).
+"""
+import heapq
+import os
+import time
+from dataclasses import dataclass
+
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix, del_prefix
+from sorl.thumbnail.models import KVStore
+
+from . import variants
+from .cache import ALL_FEEDS, bump_feed_version
+from .models import ImageVariant, Post
+from .storage import content_storage, is_content_name
+
+BATCH_SIZE = 500
+# Файл миниатюры появляется чуть раньше записи о нём в хранилище ключей,
+# а картинка — раньше поста, который на неё ссылается, поэтому свежие
+# файлы без записи и без постов не трогаем.
+GRACE_SECONDS = 10 * 60
+
+
+@dataclass
+class Report:
+    orphan_thumbnails: int = 0
+    unknown_files: int = 0
+    evicted: int = 0
+    orphan_variants: int = 0
+    orphan_images: int = 0
+    bytes_reclaimed: int = 0
+
+
+def _delete_file(storage, name) -> int:
+    """Удаляет файл; возвращает его размер в байтах."""
+    try:
+        size = storage.size(name)
+    except OSError:
+        return 0
+    storage.delete(name)
+    return size
+
+
+def drop_thumbnails(source_key) -> tuple:
+    """Удаляет миниатюры исходника с ключом source_key и записи о них.
+
+    Возвращает (число миниатюр, освобождённые байты).
+    """
+    kvstore = default.kvstore
+    count = size = 0
+    for key in kvstore._get(source_key, identity='thumbnails') or []:
+        thumbnail = kvstore._get(key)
+        if thumbnail:
+            size += _delete_file(thumbnail.storage, thumbnail.name)
+            count += 1
+        kvstore._delete(key)
+    kvstore._delete(source_key, identity='thumbnails')
+    kvstore._delete(source_key)
+    return count, size
+
+
+def drop(name) -> None:
+    """Удаляет миниатюры и адаптивные копии картинки поста name."""
+    drop_thumbnails(ImageFile(name, content_storage).key)
+    variants.delete(name)
+
+
+def _keys(identity, batch_size):
+    """Ключи хранилища sorl-thumbnail порциями, по возрастанию."""
+    prefix = add_prefix('', identity)
+    last = prefix
+    while True:
+        batch = list(
+            KVStore.objects.filter(key__startswith=prefix, key__gt=last)
+            .order_by('key')
+            .values_list('key', flat=True)[:batch_size]
+        )
+        if not batch:
+            return
+        last = batch[-1]
+        yield [del_prefix(key) for key in batch]
+
+
+def _images(keys) -> dict:
+    """{ключ: ImageFile} по записям хранилища одним запросом."""
+    rows = KVStore.objects.filter(
+        key__in=[add_prefix(key) for key in keys]
+    ).values_list('key', 'value')
+    return {
+        del_prefix(key): deserialize_image_file(value) for key, value in rows
+    }
+
+
+def collect_orphan_thumbnails(report, batch_size=BATCH_SIZE) -> None:
+    """Миниатюры картинок, на которые не ссылается ни один пост."""
+    for keys in _keys('thumbnails', batch_size):
+        sources = _images(keys)
+        referenced = set(
+            Post.objects.filter(
+                image__in=[source.name for source in sources.values()]
+            ).values_list('image', flat=True)
+        )
+        for key in keys:
+            source = sources.get(key)
+            # Записи, сделанные для прежнего хранилища поля Post.image,
+            # шаблоны уже не найдут, даже если имя файла то же.
+            if (
+                source is not None
+                and source.name in referenced
+                and key == ImageFile(source.name, content_storage).key
+            ):
+                continue
+            count, size = drop_thumbnails(key)
+            report.orphan_thumbnails += count
+            report.bytes_reclaimed += size
+
+
+def collect_orphan_variants(report) -> None:
+    """Адаптивные копии картинок, на которые не ссылается ни один пост."""
+    sources = list(
+        ImageVariant.objects.exclude(source__in=Post.objects.values('image'))
+        .order_by('source')
+        .values_list('source', flat=True)
+        .distinct()
+    )
+    storage = ImageVariant.file.field.storage
+    for source in sources:
+        for name in ImageVariant.objects.filter(source=source).values_list(
+            'file', flat=True
+        ):
+            try:
+                report.bytes_reclaimed += storage.size(name)
+            except OSError:
+                pass
+            report.orphan_variants += 1
+        variants.delete(source)
+
+
+def _files(storage, prefix):
+    """(имя, stat) файлов каталога prefix хранилища, по одному."""
+    root = storage.path('')
+    directory = storage.path(prefix)
+    for path, _, files in os.walk(directory):
+        for file in files:
+            full_name = os.path.join(path, file)
+            try:
+                stat = os.stat(full_name)
+            except FileNotFoundError:
+                continue
+            name = os.path.relpath(full_name, root).replace(os.sep, '/')
+            yield name, stat
+
+
+def _cache_files():
+    """(имя, stat) файлов в каталоге миниатюр, по одному."""
+    return _files(default.storage, thumbnail_settings.THUMBNAIL_PREFIX)
+
+
+def _batches(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def collect_unknown_files(report, batch_size=BATCH_SIZE, now=None) -> None:
+    """Файлы в каталоге миниатюр, о которых не знает хранилище ключей."""
+    now = time.time() if now is None else now
+    for batch in _batches(_cache_files(), batch_size):
+        files = {
+            add_prefix(ImageFile(name, default.storage).key): (name, stat)
+            for name, stat in batch
+        }
+        known = set(
+            KVStore.objects.filter(key__in=files)
+            .values_list('key', flat=True)
+        )
+        for key, (name, stat) in files.items():
+            if key in known or now - stat.st_mtime < GRACE_SECONDS:
+                continue
+            default.storage.delete(name)
+            report.unknown_files += 1
+            report.bytes_reclaimed += stat.st_size
+
+
+def collect_orphan_images(report, batch_size=BATCH_SIZE) -> None:
+    """Картинки постов, на которые не ссылается ни один пост.
+
+    Удаляются только файлы с именем-хэшем, которые не загружали заново
+    GRACE_SECONDS секунд (ContentHashStorage.delete_stale).
+    """
+    field = Post.image.field
+    images = (
+        (name, stat)
+        for name, stat in _files(field.storage, field.upload_to)
+        if is_content_name(name)
+    )
+    for batch in _batches(images, batch_size):
+        referenced = set(
+            Post.objects.filter(
+                image__in=[name for name, _ in batch]
+            ).values_list('image', flat=True)
+        )
+        for name, stat in batch:
+            if name in referenced or not field.storage.delete_stale(
+                name, GRACE_SECONDS
+            ):
+                continue
+            drop(name)
+            report.orphan_images += 1
+            report.bytes_reclaimed += stat.st_size
+
+
+def enforce_budget(report, max_size) -> None:
+    """Вытесняет давно не использовавшиеся миниатюры сверх max_size байт.
+
+    Вместе с файлом удаляется запись о нём, поэтому при следующем показе
+    миниатюра снова встанет в очередь на нарезку.
+    """
+    excess = sum(stat.st_size for _, stat in _cache_files()) - max_size
+    if excess <= 0:
+        return
+    # Самые давние файлы суммарным размером не меньше excess. Куча
+    # упорядочена от свежих к давним, сверху — самый свежий из отобранных.
+    heap, size = [], 0
+    for name, stat in _cache_files():
+        used = max(stat.st_atime, stat.st_mtime)
+        if size >= excess and -heap[0][0] <= used:
+            continue
+        heapq.heappush(heap, (-used, stat.st_size, name))
+        size += stat.st_size
+        while size - heap[0][1] >= excess:
+            size -= heapq.heappop(heap)[1]
+    for _, file_size, name in heap:
+        default.kvstore._delete(ImageFile(name, default.storage).key)
+        default.storage.delete(name)
+        report.evicted += 1
+        report.bytes_reclaimed += file_size
+
+
+def collect(max_size=None, batch_size=BATCH_SIZE) -> Report:
+    """Полная сборка мусора; max_size — бюджет media/cache в байтах."""
+    report = Report()
+    collect_orphan_thumbnails(report, batch_size)
+    collect_orphan_variants(report)
+    collect_orphan_images(report, batch_size)
+    collect_unknown_files(report, batch_size)
+    if max_size:
+        enforce_budget(report, max_size)
+    if report.evicted:
+        # На закэшированных страницах остались ссылки на вытесненные файлы.
+        bump_feed_version(ALL_FEEDS)
+    return report
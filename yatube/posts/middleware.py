@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from .cache import cache_page, get_cached_page, replica_lags
+
+
+class AnonymousPageCacheMiddleware:
+    """Кэш целых страниц для анонимных читателей.
+
+    Кэшируются только страницы, представления которых указали ленты,
+    от которых зависят (request.page_cache_feeds), и только GET-запросы
+    без входа в систему. Ответы с формами (CSRF-токеном) и cookie
+    не кэшируются, как и страницы из реплики, отстающей от их лент.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method not in ('GET', 'HEAD') or (
+            request.user.is_authenticated
+        ):
+            return self.get_response(request)
+        response = get_cached_page(request)
+        if response is not None:
+            # Сохранённый ответ несёт свои ETag и Last-Modified.
+            return get_conditional_response(
+                request,
+                etag=response.get('ETag'),
+                last_modified=parse_http_date_safe(
+                    response.get('Last-Modified', '')
+                ),
+                response=response,
+            )
+        response = self.get_response(request)
+        feeds = getattr(request, 'page_cache_feeds', None)
+        if (
+            feeds is not None
+            and self.is_cacheable(request, response)
+            and not replica_lags(feeds)
+        ):
+            cache_page(request, response, feeds, settings.PAGE_CACHE_TIMEOUT)
+        return response
+
+    def is_cacheable(self, request, response):
+        return (
+            request.method == 'GET'
+            and response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and not request.META.get('CSRF_COOKIE_USED')
+        )
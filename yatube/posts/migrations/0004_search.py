@@ -0,0 +1,38 @@
+# Generated by Django 2.2.16 on 2026-10-18 09:40
+
+from django.db import migrations
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE posts_search USING fts5("
+        "body, post_id UNINDEXED, tokenize = 'trigram')"
+    )
+    schema_editor.execute(
+        'INSERT INTO posts_search (rowid, body, post_id) '
+        f'SELECT id * 2, text, id FROM {Post._meta.db_table}'
+    )
+    schema_editor.execute(
+        'INSERT INTO posts_search (rowid, body, post_id) '
+        f'SELECT id * 2 + 1, text, post_id FROM {Comment._meta.db_table}'
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
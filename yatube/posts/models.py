@@ -4,6 +4,8 @@ from django.utils.text import slugify
 
 from core.models import CreatedModel
 
+from .storage import content_storage
+
 User = get_user_model()
 
 
@@ -13,6 +15,9 @@ class Group(models.Model):
     title = models.CharField(max_length=200, verbose_name="Название группы")
     slug = models.SlugField(unique=True, verbose_name="Атрибут группы")
     description = models.TextField(verbose_name="Описание группы")
+    post_count = models.PositiveIntegerField(
+        "Число постов", default=0, editable=False
+    )
 
     class Meta:
         verbose_name: str = "группа"
@@ -41,12 +46,50 @@ class Post(CreatedModel):
         related_name="posts",
         verbose_name="Группа, к которой будет относиться пост",
     )
-    image = models.ImageField("Картинка", upload_to="posts/", blank=True)
+    # Файлы хранятся по хэшу содержимого; индекс нужен для подсчёта
+    # постов, которые ссылаются на файл.
+    image = models.ImageField(
+        "Картинка",
+        upload_to="posts/",
+        blank=True,
+        storage=content_storage,
+        db_index=True,
+    )
+    # Сведения о картинке заполняются один раз после загрузки
+    # (posts.image_meta), чтобы лента не открывала файлы при рендере.
+    image_width = models.PositiveIntegerField(
+        "Ширина картинки", null=True, blank=True, editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        "Высота картинки", null=True, blank=True, editable=False
+    )
+    image_color = models.CharField(
+        "Основной цвет картинки", max_length=7, blank=True, editable=False
+    )
+    image_placeholder = models.TextField(
+        "Заглушка картинки", blank=True, editable=False
+    )
+    comment_count = models.PositiveIntegerField(
+        "Число комментариев", default=0, editable=False
+    )
 
     class Meta:
         ordering = ("-pub_date", "author")
         verbose_name: str = "опубликованный пост"
         verbose_name_plural: str = "Опубликованные посты"
+        # Индексы повторяют фильтр и сортировку лент: главной, группы
+        # и профиля, — чтобы страница читалась по индексу без сортировки.
+        indexes = [
+            models.Index(
+                fields=["-pub_date", "author"], name="post_date_author"
+            ),
+            models.Index(
+                fields=["group", "-pub_date", "author"], name="post_group_date"
+            ),
+            models.Index(
+                fields=["author", "-pub_date"], name="post_author_date"
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.text[:15]
@@ -72,6 +115,11 @@ class Comment(CreatedModel):
         ordering = ("-pub_date",)
         verbose_name: str = "опубликованный комментарий"
         verbose_name_plural: str = "Опубликованные комментарии"
+        indexes = [
+            models.Index(
+                fields=["post", "-pub_date"], name="comment_post_date"
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.text
@@ -96,3 +144,70 @@ class Follow(models.Model):
                 fields=["user", "author"], name="follower_author_connection"
             )
         ]
+        indexes = [
+            models.Index(fields=["author", "user"], name="follow_author_user"),
+        ]
+
+
+class FeedEntry(models.Model):
+    """Запись материализованной ленты подписки пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="feed_entries",
+        verbose_name="Читатель ленты",
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="feed_entries",
+        verbose_name="Пост",
+    )
+    author = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="+", verbose_name="Автор"
+    )
+    pub_date = models.DateTimeField("Дата публикации")
+
+    class Meta:
+        ordering = ("-pub_date",)
+        verbose_name: str = "запись ленты подписки"
+        verbose_name_plural: str = "Записи ленты подписки"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "post"], name="feed_entry_user_post"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-pub_date", "author"],
+                name="feed_entry_user_date",
+            ),
+        ]
+
+
+class ImageVariant(models.Model):
+    """Уменьшенная копия картинки поста заданной ширины и формата.
+
+    Копии привязаны к файлу картинки, а не к посту: одинаковые картинки
+    хранятся одним файлом (posts.storage) и получают общий набор копий.
+    """
+
+    source = models.CharField("Исходная картинка", max_length=100)
+    format = models.CharField("Формат", max_length=10)
+    width = models.PositiveIntegerField("Ширина")
+    height = models.PositiveIntegerField("Высота")
+    file = models.FileField("Файл", max_length=255)
+
+    class Meta:
+        ordering = ("source", "format", "width")
+        verbose_name: str = "размер картинки"
+        verbose_name_plural: str = "Размеры картинок"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["source", "format", "width"], name="image_variant"
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.source} {self.width}w {self.format}"
@@ -0,0 +1,171 @@
+"""Полнотекстовый поиск по постам и комментариям.
+
+Тексты хранятся в виртуальной таблице SQLite FTS5 posts_search с
+триграммным токенизатором. Он не зависит от языка и находит русские слова
+по любой их части, в том числе с другим окончанием. Пост и его комментарии
+лежат в таблице отдельными строками с общим post_id, а сигналы обновляют
+индекс при сохранении и удалении объектов. На других базах поиск
+выполняется обычным icontains.
+"""
+from django.db import connections, router
+from django.db.models import Q
+
+from .models import Comment, Post
+
+TABLE = 'posts_search'
+# Триграммный токенизатор находит только подстроки от трёх символов.
+MIN_TERM_LENGTH = 3
+
+
+def _connection():
+    return connections[router.db_for_write(Post)]
+
+
+def _read_connection():
+    return connections[router.db_for_read(Post)]
+
+
+def is_available(connection=None) -> bool:
+    """Есть ли индекс FTS5 в базе постов."""
+    return (connection or _connection()).vendor == 'sqlite'
+
+
+def _rowid(instance) -> int:
+    # Посты занимают чётные rowid, комментарии — нечётные.
+    return instance.pk * 2 + isinstance(instance, Comment)
+
+
+def index(instance) -> None:
+    """Добавляет или обновляет пост либо комментарий в индексе."""
+    connection = _connection()
+    if not is_available(connection):
+        return
+    if isinstance(instance, Comment):
+        post_id = instance.post_id
+    else:
+        post_id = instance.pk
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {TABLE} WHERE rowid = %s', [_rowid(instance)]
+        )
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, body, post_id) VALUES (%s, %s, %s)',
+            [_rowid(instance), instance.text, post_id],
+        )
+
+
+def unindex(instance) -> None:
+    connection = _connection()
+    if not is_available(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {TABLE} WHERE rowid = %s', [_rowid(instance)]
+        )
+
+
+def rebuild_index() -> None:
+    """Заново заполняет индекс всеми постами и комментариями."""
+    connection = _connection()
+    if not is_available(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, body, post_id) '
+            f'SELECT id * 2, text, id FROM {Post._meta.db_table}'
+        )
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, body, post_id) '
+            f'SELECT id * 2 + 1, text, post_id FROM {Comment._meta.db_table}'
+        )
+
+
+def _terms(query):
+    return [term for term in query.split() if len(term) >= MIN_TERM_LENGTH]
+
+
+def match_expression(query) -> str:
+    """Запрос FTS5: все слова запроса как фразы, соединённые через AND.
+
+    Кавычки экранируются, поэтому операторы FTS5 из ввода не работают.
+    Слова короче трёх символов триграммы не находят, они отбрасываются.
+    """
+    return ' '.join(
+        '"{}"'.format(term.replace('"', '""')) for term in _terms(query)
+    )
+
+
+def filter_matching(queryset, query):
+    """Посты из queryset, в тексте или комментариях которых есть query.
+
+    Отбор идёт подзапросом к индексу внутри того же SQL-запроса.
+    """
+    return queryset.extra(
+        where=[
+            f'{Post._meta.db_table}.id IN '
+            f'(SELECT post_id FROM {TABLE} WHERE {TABLE} MATCH %s)'
+        ],
+        params=[match_expression(query)],
+    )
+
+
+class SearchResults:
+    """Найденные посты в порядке релевантности (bm25).
+
+    Поддерживает count() и срезы, поэтому подходит для Paginator: страница
+    — это один запрос к индексу и один запрос за самими постами.
+    """
+
+    def __init__(self, queryset, match):
+        self.queryset = queryset
+        self.match = match
+        self._count = None
+
+    def _execute(self, sql, params):
+        with _read_connection().cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def count(self):
+        if self._count is None:
+            self._count = self._execute(
+                f'SELECT count(DISTINCT post_id) FROM {TABLE} '
+                f'WHERE {TABLE} MATCH %s',
+                [self.match],
+            )[0][0]
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            raise TypeError('SearchResults поддерживает только срезы.')
+        start = key.start or 0
+        limit = -1 if key.stop is None else max(key.stop - start, 0)
+        ids = [
+            row[0]
+            for row in self._execute(
+                f'SELECT post_id FROM {TABLE} WHERE {TABLE} MATCH %s '
+                f'GROUP BY post_id ORDER BY min(rank), post_id DESC '
+                f'LIMIT %s OFFSET %s',
+                [self.match, limit, start],
+            )
+        ]
+        posts = self.queryset.in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def search_posts(queryset, query):
+    """Посты из queryset, подходящие под поисковую строку query."""
+    if not _terms(query):
+        return queryset.none()
+    if is_available(_read_connection()):
+        return SearchResults(queryset, match_expression(query))
+    condition = Q()
+    for term in _terms(query):
+        condition &= (
+            Q(text__icontains=term) | Q(comments__text__icontains=term)
+        )
+    return queryset.filter(condition).distinct()
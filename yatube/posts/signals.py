@@ -0,0 +1,265 @@
+from django.core.signals import request_finished, request_started
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from users.models import Profile
+
+from . import feed, image_meta, media_gc, search, thumbnails
+from .cache import ALL_FEEDS, INDEX_FEED, bump_feed_version, feed_key
+from .counters import change_counter, change_post_count
+from .models import Comment, Follow, Group, Post, User
+from .storage import is_content_name
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    """Новый пост попадает в ленты подписчиков автора."""
+    if created:
+        feed.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, **kwargs):
+    if created:
+        feed.backfill(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_feed(sender, instance, **kwargs):
+    feed.trim(instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous(sender, instance, **kwargs):
+    """Запоминает прежние группу и картинку поста.
+
+    Сведения о прежней картинке (posts.image_meta) к новой не относятся.
+    """
+    previous = (
+        Post.objects.filter(pk=instance.pk)
+        .values_list('group_id', 'image')
+        .first()
+        if instance.pk
+        else None
+    )
+    instance._previous_group_id, instance._previous_image = (
+        previous or (None, None)
+    )
+    if instance.image.name != instance._previous_image:
+        image_meta.reset(instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_feeds(sender, instance, **kwargs):
+    feeds = {
+        INDEX_FEED,
+        feed_key('profile', instance.author_id),
+        feed_key('post', instance.pk),
+    }
+    for group_id in (
+        instance.group_id, getattr(instance, '_previous_group_id', None)
+    ):
+        if group_id is not None:
+            feeds.add(feed_key('group', group_id))
+    bump_feed_version(*feeds)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_feeds(sender, instance, **kwargs):
+    bump_feed_version(feed_key('post', instance.post_id))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_feeds(sender, instance, **kwargs):
+    # Ссылки на группы есть во всех лентах.
+    bump_feed_version(ALL_FEEDS)
+
+
+# Поля пользователя, которые показаны в карточках его постов.
+AUTHOR_DISPLAY_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=User)
+def remember_display_name(sender, instance, update_fields=None, **kwargs):
+    """Запоминает, меняется ли имя автора."""
+    instance._display_name_changed = False
+    if not instance.pk or (
+        update_fields is not None
+        and not set(update_fields) & set(AUTHOR_DISPLAY_FIELDS)
+    ):
+        return
+    previous = (
+        User.objects.filter(pk=instance.pk)
+        .values_list(*AUTHOR_DISPLAY_FIELDS)
+        .first()
+    )
+    instance._display_name_changed = previous is not None and previous != (
+        tuple(getattr(instance, field) for field in AUTHOR_DISPLAY_FIELDS)
+    )
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_profile_feed(sender, instance, **kwargs):
+    """Имя автора показано на его странице и на страницах его постов.
+
+    Карточки его постов есть и в общих лентах, а фрагменты этих лент от
+    версии профиля не зависят, поэтому новое имя сбрасывает все ленты.
+    """
+    if getattr(instance, '_display_name_changed', False):
+        bump_feed_version(ALL_FEEDS)
+    else:
+        bump_feed_version(feed_key('profile', instance.pk))
+
+
+def _change_group_count(group_id, delta):
+    if group_id is not None:
+        change_counter(Group.objects.filter(pk=group_id), 'post_count', delta)
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    if created:
+        change_post_count(1, INDEX_FEED)
+        change_counter(
+            Profile.objects.filter(user_id=instance.author_id),
+            'post_count', 1,
+        )
+        _change_group_count(instance.group_id, 1)
+        return
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    if previous_group_id != instance.group_id:
+        _change_group_count(previous_group_id, -1)
+        _change_group_count(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    change_post_count(-1, INDEX_FEED)
+    change_counter(
+        Profile.objects.filter(user_id=instance.author_id), 'post_count', -1
+    )
+    _change_group_count(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            Post.objects.filter(pk=instance.post_id), 'comment_count', 1
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    change_counter(
+        Post.objects.filter(pk=instance.post_id), 'comment_count', -1
+    )
+
+
+@receiver(post_save, sender=Follow)
+def count_saved_follow(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            Profile.objects.filter(user_id=instance.author_id),
+            'follower_count', 1,
+        )
+        change_counter(
+            Profile.objects.filter(user_id=instance.user_id),
+            'following_count', 1,
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    change_counter(
+        Profile.objects.filter(user_id=instance.author_id),
+        'follower_count', -1,
+    )
+    change_counter(
+        Profile.objects.filter(user_id=instance.user_id),
+        'following_count', -1,
+    )
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def switch_feed_pull(sender, instance, **kwargs):
+    """Раскладка постов автора зависит от числа подписчиков.
+
+    Подключён после count_saved_follow и count_deleted_follow, поэтому
+    видит уже изменённый счётчик.
+    """
+    feed.update_pull(instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def pregenerate_thumbnails(sender, instance, created, **kwargs):
+    """Миниатюры новой картинки готовятся в фоне, а не при просмотре."""
+    if created or instance.image.name != instance._previous_image:
+        thumbnails.schedule_post(instance)
+
+
+def _release_image(name):
+    """Удаляет картинку, если на неё не ссылается ни один пост.
+
+    Одинаковые картинки хранятся одним файлом (posts.storage), поэтому
+    число ссылок — это число постов с таким же именем файла. Вместе с
+    картинкой удаляются её миниатюры и адаптивные копии. Недавно
+    загруженный файл мог понадобиться посту, который ещё сохраняется;
+    такой файл остаётся, а без ссылок его потом удалит gc_thumbnails.
+    """
+    def release():
+        if Post.objects.filter(image=name).exists():
+            return
+        # Файлы со старыми именами не делятся между постами по
+        # содержимому; их переносит команда dedupe_images.
+        if is_content_name(name) and not (
+            Post.image.field.storage.delete_stale(
+                name, media_gc.GRACE_SECONDS
+            )
+        ):
+            return
+        media_gc.drop(name)
+
+    if name:
+        transaction.on_commit(release)
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_image', None)
+    if not created and previous != instance.image.name:
+        _release_image(previous)
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    _release_image(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+def index_text(sender, instance, **kwargs):
+    search.index(instance)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+def unindex_text(sender, instance, **kwargs):
+    search.unindex(instance)
+
+
+@receiver(request_started)
+def start_thumbnail_queue(sender, **kwargs):
+    thumbnails.start_queue()
+
+
+@receiver(request_finished)
+def run_thumbnail_queue(sender, **kwargs):
+    """Миниатюры режутся, когда ответ уже отправлен клиенту."""
+    thumbnails.run_queue()
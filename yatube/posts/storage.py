@@ -0,0 +1,97 @@
+"""Хранение картинок постов по хэшу содержимого.
+
+Файл пишется на диск порциями, и по пути считается его SHA-256. Имя
+файла — это хэш, поэтому одинаковые картинки, загруженные под разными
+именами, занимают на диске одно место, а sorl-thumbnail, который строит
+имя миниатюры из имени исходника, режет их один раз. Файл удаляется,
+когда на него больше не ссылается ни один пост (см. signals.release_image).
+
+Загрузка уже известной картинки обновляет время изменения её файла, а
+удаляется файл, только если его давно не загружали заново: иначе пост,
+сохраняемый одновременно с удалением, мог бы сослаться на удалённый файл.
+"""
+import hashlib
+import os
+import posixpath
+import time
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+def content_name(directory, digest, original_name) -> str:
+    """'posts/3f/3f…9a.jpg': каталог, два знака хэша, хэш и расширение."""
+    extension = os.path.splitext(original_name)[1].lower()
+    return posixpath.join(directory, digest[:2], digest + extension)
+
+
+def is_content_name(name) -> bool:
+    """Сохранён ли файл уже под именем-хэшем."""
+    stem = os.path.splitext(posixpath.basename(name))[0]
+    return (
+        len(stem) == 64
+        and posixpath.basename(posixpath.dirname(name)) == stem[:2]
+    )
+
+
+@deconstructible
+class ContentHashStorage(FileSystemStorage):
+    def _save(self, name, content):
+        directory = posixpath.dirname(name)
+        full_directory = self.path(directory)
+        os.makedirs(full_directory, exist_ok=True)
+        temporary = os.path.join(
+            full_directory, f'.upload-{uuid.uuid4().hex}'
+        )
+        digest = hashlib.sha256()
+        try:
+            fd = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+            with os.fdopen(fd, 'wb') as file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    file.write(chunk)
+            name = content_name(directory, digest.hexdigest(), name)
+            full_path = self.path(name)
+            try:
+                # Свежее время изменения защищает файл от delete_stale.
+                os.utime(full_path)
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                # Переименование атомарно: файл появляется сразу целым.
+                os.replace(temporary, full_path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(full_path, self.file_permissions_mode)
+            else:
+                os.remove(temporary)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return name
+
+    def delete_stale(self, name, max_age) -> bool:
+        """Удаляет файл, если его не загружали заново max_age секунд.
+
+        Файл сначала атомарно переименовывается: загрузка, которая придёт
+        после этого, уже не найдёт его и запишет свою копию. Если же
+        загрузка успела обновить время изменения, файл возвращается на
+        место — содержимое у копий одно и то же. Возвращает, удалён ли
+        файл.
+        """
+        full_path = self.path(name)
+        claimed = os.path.join(
+            os.path.dirname(full_path), f'.delete-{uuid.uuid4().hex}'
+        )
+        try:
+            os.rename(full_path, claimed)
+        except FileNotFoundError:
+            return False
+        if time.time() - os.stat(claimed).st_mtime < max_age:
+            os.replace(claimed, full_path)
+            return False
+        os.remove(claimed)
+        return True
+
+
+content_storage = ContentHashStorage()
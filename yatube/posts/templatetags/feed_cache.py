@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.template import Library, Node, TemplateSyntaxError
+
+from ..cache import feed_key, get_feed_versions, replica_lags
+
+register = Library()
+
+
+class FeedCacheNode(Node):
+    def __init__(self, nodelist, name, pk):
+        self.nodelist = nodelist
+        self.name = name
+        self.pk = pk
+
+    def render(self, context):
+        pk = self.pk.resolve(context) if self.pk is not None else None
+        feed = feed_key(self.name.resolve(context), pk)
+        page_obj = context.get('page_obj')
+        vary_on = [get_feed_versions(feed)]
+        if page_obj is not None:
+            vary_on += [
+                page_obj.number,
+                getattr(page_obj, 'previous_cursor', None),
+                getattr(page_obj, 'next_cursor', None),
+            ]
+        cache_key = make_template_fragment_key(f'feed:{feed}', vary_on)
+        value = cache.get(cache_key)
+        if value is None:
+            value = self.nodelist.render(context)
+            if not replica_lags((feed,)):
+                cache.set(cache_key, value, settings.FEED_CACHE_TIMEOUT)
+        return value
+
+
+@register.tag('feedcache')
+def do_feedcache(parser, token):
+    """
+    Кэширует фрагмент ленты до её изменения.
+
+    Ключ зависит от версии ленты и от текущей страницы page_obj::
+
+        {% load feed_cache %}
+        {% feedcache 'group' group.pk %}
+            .. посты группы ..
+        {% endfeedcache %}
+    """
+    nodelist = parser.parse(('endfeedcache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) not in (2, 3):
+        raise TemplateSyntaxError(
+            "'%s' tag requires a feed name and an optional id." % tokens[0]
+        )
+    pk = parser.compile_filter(tokens[2]) if len(tokens) == 3 else None
+    return FeedCacheNode(nodelist, parser.compile_filter(tokens[1]), pk)
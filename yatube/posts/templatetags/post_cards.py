@@ -0,0 +1,26 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from ..cards import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post):
+    """Карточка поста; для всей страницы ленты — разом.
+
+    Готовые карточки хранятся в запросе, поэтому остальные посты той же
+    страницы берут свои карточки оттуда.
+    """
+    request = context.get('request')
+    cards = getattr(request, '_post_cards', None)
+    if cards is None or post.pk not in cards:
+        posts = [post] + [
+            item for item in context.get('page_obj') or ()
+            if item.pk != post.pk
+        ]
+        cards = {**(cards or {}), **render_cards(posts, request)}
+        if request is not None:
+            request._post_cards = cards
+    return mark_safe(cards[post.pk])
@@ -0,0 +1,108 @@
+from django import template
+from django.conf import settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+
+from .. import variants
+
+register = template.Library()
+
+DEFAULT_SIZES = '(max-width: 960px) 100vw, 960px'
+
+
+def _srcset(items):
+    return ', '.join(f'{item.file.url} {item.width}w' for item in items)
+
+
+def _variants(context, name):
+    """Копии картинки; для всей страницы ленты — одним запросом.
+
+    Найденное хранится в запросе, поэтому остальные посты той же страницы
+    берут свои копии оттуда.
+    """
+    request = context.get('request')
+    found = getattr(request, '_image_variants', None)
+    if found is None or name not in found:
+        names = {name} | {
+            post.image.name
+            for post in context.get('page_obj') or ()
+            if getattr(post, 'image', None)
+        }
+        found = {**(found or {}), **variants.variants_for(names)}
+        if request is not None:
+            request._image_variants = found
+    return found[name]
+
+
+def _background(image) -> str:
+    """CSS-фон картинки: основной цвет и размытая заглушка из поста."""
+    post = getattr(image, 'instance', None)
+    color = getattr(post, 'image_color', '')
+    placeholder = getattr(post, 'image_placeholder', '')
+    if placeholder:
+        return f'{color} url({placeholder}) center / cover no-repeat'.strip()
+    return color
+
+
+def _crop_size(image):
+    """Размеры миниатюры 960x339 по размерам картинки из полей поста.
+
+    Считаются так же, как их режет sorl-thumbnail с crop: картинка
+    масштабируется до покрытия рамки и обрезается по ней. None, если
+    размеры картинки ещё не известны.
+    """
+    post = getattr(image, 'instance', None)
+    width = getattr(post, 'image_width', None)
+    height = getattr(post, 'image_height', None)
+    if not width or not height:
+        return None
+    frame_width, frame_height = settings.IMAGE_VARIANT_RATIO
+    factor = max(frame_width / width, frame_height / height)
+    if factor < 1 or thumbnail_settings.THUMBNAIL_UPSCALE:
+        width, height = round(width * factor), round(height * factor)
+    return {
+        'width': min(width, frame_width),
+        'height': min(height, frame_height),
+    }
+
+
+@register.inclusion_tag('posts/includes/picture.html', takes_context=True)
+def picture(context, image, sizes=DEFAULT_SIZES):
+    """<picture> с копиями картинки разных ширин и форматов.
+
+    Пока копии не готовы, выводится сама картинка с размерами миниатюры
+    из полей поста, а если их ещё нет — миниатюра {% thumbnail %}. Пока
+    картинка грузится, на её месте видна заглушка из полей поста.
+    """
+    if not image:
+        return {'image': None}
+    by_format = _variants(context, image.name)
+    *formats, fallback_format = settings.IMAGE_VARIANT_FORMATS
+    fallback = by_format.get(fallback_format)
+    background = _background(image)
+    if not fallback:
+        return {
+            'image': image,
+            'fallback': None,
+            'size': _crop_size(image),
+            'background': background,
+        }
+    largest = fallback[-1]
+    return {
+        'image': image,
+        'background': background,
+        'sizes': sizes,
+        'sources': [
+            {
+                'type': variants.MIME_TYPES[format_],
+                'srcset': _srcset(by_format[format_]),
+            }
+            for format_ in formats
+            if by_format.get(format_)
+        ],
+        'fallback': {
+            'url': largest.file.url,
+            'srcset': _srcset(fallback),
+            'width': largest.width,
+            'height': largest.height,
+        },
+    }
@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase
+
+from ..cards import render_cards
+from ..models import Post
+
+User = get_user_model()
+
+
+class PostCardTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.posts = [
+            Post.objects.create(text=f'Пост {number}', author=cls.user)
+            for number in range(3)
+        ]
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def render_feed(self, posts):
+        return Template(
+            "{% load post_cards %}"
+            "{% for post in page_obj %}{% post_card post %}{% endfor %}"
+        ).render(Context({
+            'page_obj': posts, 'request': RequestFactory().get('/'),
+        }))
+
+    def test_same_html_as_include(self):
+        """Карточки совпадают с подключением шаблона поста"""
+        included = Template(
+            "{% for post in page_obj %}"
+            "{% include 'posts/post.html' %}"
+            "{% endfor %}"
+        ).render(Context({'page_obj': self.posts}))
+
+        self.assertEqual(self.render_feed(self.posts), included)
+
+    def test_page_rendered_once(self):
+        """Карточки страницы рендерятся пачкой, потом берутся из кэша"""
+        self.render_feed(self.posts)
+        Post.objects.filter(pk=self.posts[0].pk).update(text='Без сигнала')
+
+        self.assertNotIn('Без сигнала', self.render_feed(self.posts))
+
+    def test_changed_post_rerendered(self):
+        """Изменение поста сбрасывает только его карточку"""
+        first = render_cards(self.posts)
+        post = Post.objects.get(pk=self.posts[0].pk)
+        post.text = 'Новый текст'
+        post.save()
+
+        second = render_cards([post, *self.posts[1:]])
+
+        self.assertIn('Новый текст', second[post.pk])
+        self.assertEqual(first[self.posts[1].pk], second[self.posts[1].pk])
+
+    def test_author_rename_rerenders(self):
+        """Новое имя автора попадает в его карточки"""
+        render_cards(self.posts)
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name, user.last_name = 'Лев', 'Толстой'
+        user.save()
+
+        cards = render_cards(Post.objects.select_related('author'))
+
+        self.assertIn('Лев Толстой', cards[self.posts[2].pk])
@@ -0,0 +1,176 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group as AuthGroup
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from users.models import Profile
+
+from ..content import export_content, import_content, iter_json_array
+from ..models import Comment, FeedEntry, Follow, Group, Post
+from ..search import search_posts
+
+User = get_user_model()
+
+DUMP_PATH = os.path.join(settings.BASE_DIR, 'dump.json')
+
+
+class ContentTransferTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='описание'
+        )
+        cls.post = Post.objects.create(
+            text='Первый пост', author=cls.author, group=cls.group
+        )
+        Post.objects.create(text='Второй пост', author=cls.author)
+        Comment.objects.create(
+            text='Интересный комментарий', author=cls.reader, post=cls.post
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def export_and_clear(self, format_):
+        stream = StringIO()
+        export_content(stream, format_, chunk_size=1)
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        stream.seek(0)
+        return stream
+
+    def assert_restored(self):
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(
+            Group.objects.get(slug='test-slug').post_count, 1
+        )
+        profile = Profile.objects.get(user__username='author')
+        self.assertEqual(profile.post_count, 2)
+        self.assertEqual(profile.follower_count, 1)
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).comment_count, 1
+        )
+        self.assertEqual(
+            FeedEntry.objects.filter(user__username='reader').count(), 2
+        )
+        self.assertEqual(
+            list(search_posts(Post.objects.all(), 'интересн')[:10]),
+            [Post.objects.get(pk=self.post.pk)],
+        )
+
+    def test_json_round_trip(self):
+        """Выгрузка в JSON загружается обратно вместе со счётчиками"""
+        stream = self.export_and_clear('json')
+
+        saved, skipped = import_content(stream, 'json', batch_size=2)
+
+        self.assertEqual(saved[Post], 2)
+        self.assert_restored()
+
+    def test_ndjson_round_trip(self):
+        """Выгрузка в NDJSON загружается обратно"""
+        stream = self.export_and_clear('ndjson')
+
+        import_content(stream, 'ndjson', batch_size=2)
+
+        self.assert_restored()
+
+    def test_export_prefetches_user_relations(self):
+        """Группы и права пользователей выгружаются без запроса на строку"""
+        group = AuthGroup.objects.create(name='редакторы')
+        for number in range(5):
+            User.objects.create_user(username=f'user{number}').groups.add(
+                group
+            )
+        stream = StringIO()
+
+        # Пачка пользователей и две её связи m2m, пустой хвост пачек.
+        with self.assertNumQueries(4):
+            export_content(stream, models=(User,))
+
+        users = json.loads(stream.getvalue())
+        self.assertEqual(len(users), 7)
+        self.assertEqual(users[-1]['fields']['groups'], [group.pk])
+
+    def test_batch_larger_than_backend_limit(self):
+        """Пачка больше предела одного INSERT в SQLite загружается"""
+        records = [
+            {
+                'model': 'posts.group',
+                'pk': 1000 + number,
+                'fields': {
+                    'title': f'Группа {number}',
+                    'slug': f'group-{number}',
+                    'description': 'описание',
+                },
+            }
+            for number in range(600)
+        ]
+        stream = StringIO(json.dumps(records))
+
+        saved, skipped = import_content(stream, 'json', batch_size=1000)
+
+        self.assertEqual(saved[Group], 600)
+
+    def test_json_array_read_in_chunks(self):
+        """Массив разбирается по записи, даже если чанк рвёт объект"""
+        text = '[ {"a": "x,]"} ,\n{"b": [1, 2]}]'
+        items = list(iter_json_array(StringIO(text), chunk_size=3))
+
+        self.assertEqual(items, [{'a': 'x,]'}, {'b': [1, 2]}])
+        with self.assertRaises(ValueError):
+            list(iter_json_array(StringIO('[{"a": 1},'), chunk_size=3))
+
+    def test_import_dump_command(self):
+        """Команда загружает dump.json, пропуская служебные модели"""
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        out = StringIO()
+
+        call_command('import_content', DUMP_PATH, batch_size=20, stdout=out)
+
+        self.assertEqual(Post.objects.count(), 50)
+        self.assertIn('auth.permission: пропущено 44', out.getvalue())
+        group = Group.objects.get(slug='aforizm')
+        self.assertEqual(group.post_count, group.posts.count())
+
+    def test_reimport_existing_pks_changes_nothing(self):
+        """Загрузка с уже занятым pk отменяется целиком"""
+        records = [
+            {
+                'model': 'posts.group',
+                'pk': pk,
+                'fields': {'title': 'Группа', 'slug': slug, 'description': ''},
+            }
+            for pk, slug in ((5000, 'new'), (self.group.pk, 'again'))
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'content.json')
+            with open(path, 'w', encoding='utf-8') as dump:
+                json.dump(records, dump)
+
+            with self.assertRaisesMessage(CommandError, 'база не изменена'):
+                call_command(
+                    'import_content', path, batch_size=1, stdout=StringIO()
+                )
+
+        self.assertFalse(Group.objects.filter(pk=5000).exists())
+        self.assertEqual(Group.objects.get(pk=self.group.pk).slug, 'test-slug')
+
+    def test_export_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'content.ndjson')
+            call_command('export_content', path, stdout=StringIO())
+            with open(path, encoding='utf-8') as stream:
+                lines = stream.readlines()
+
+        self.assertEqual(len(lines), 7)
+        self.assertIn('"model": "posts.post"', lines[3])
@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 from http import HTTPStatus
@@ -165,7 +166,9 @@ class PostFormCreateTest(TestCase):
         self.assertEqual(posts_count, number_of_posts)
         self.assertEqual(post.author, self.user)
         self.assertEqual(post.text, text)
-        self.assertEqual(post.image, f'posts/{uploaded.name}')
+        # Картинка хранится под хэшем содержимого.
+        digest = hashlib.sha256(small_gif).hexdigest()
+        self.assertEqual(post.image, f'posts/{digest[:2]}/{digest}.gif')
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -0,0 +1,113 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import image_meta, variants
+from ..models import Post
+from ..storage import content_storage
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def photo(width, height, color='red', name='photo.jpg'):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, format='JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageMetaTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            text='тест', author=cls.user, image=photo(1200, 800)
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def test_measure(self):
+        """Размеры, цвет и заглушка сохраняются в посте"""
+        self.assertEqual(image_meta.measure(self.post.image.name), 1)
+
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual((post.image_width, post.image_height), (1200, 800))
+        red, green, blue = bytes.fromhex(post.image_color[1:])
+        self.assertGreater(red, 240)
+        self.assertLess(max(green, blue), 16)
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/webp;base64,')
+        )
+        self.assertLess(len(post.image_placeholder), 300)
+
+    def test_shared_image_described_once(self):
+        """Пост с той же картинкой берёт сведения у другого, без файла"""
+        image_meta.measure(self.post.image.name)
+        post = Post.objects.create(
+            text='тест', author=self.user, image=self.post.image.name
+        )
+
+        with mock.patch.object(
+            content_storage, 'open', side_effect=AssertionError
+        ):
+            self.assertEqual(image_meta.measure(post.image.name), 1)
+
+        self.assertEqual(
+            Post.objects.get(pk=post.pk).image_placeholder,
+            Post.objects.get(pk=self.post.pk).image_placeholder,
+        )
+
+    def test_replaced_image_reset(self):
+        """При замене картинки сведения о прежней забываются"""
+        image_meta.measure(self.post.image.name)
+        post = Post.objects.get(pk=self.post.pk)
+
+        post.image = photo(300, 200, 'blue', 'other.jpg')
+        post.save()
+
+        post.refresh_from_db()
+        self.assertIsNone(post.image_width)
+        self.assertEqual(post.image_placeholder, '')
+
+    def test_feed_renders_without_files(self):
+        """Лента выводит заглушку и не открывает файлы картинок"""
+        variants.generate(self.post.image.name)
+        image_meta.measure(self.post.image.name)
+
+        with mock.patch.object(
+            content_storage, 'open', side_effect=AssertionError
+        ):
+            response = self.client.get(reverse('posts_page:index'))
+
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertContains(
+            response, f'background: {post.image_color} url(data:image/webp'
+        )
+
+    def test_measure_images_command(self):
+        """Команда описывает картинки постов, у которых сведений нет"""
+        out = StringIO()
+
+        call_command('measure_images', stdout=out)
+
+        self.assertIn('Обновлено постов: 1.', out.getvalue())
+        self.assertIsNotNone(Post.objects.get(pk=self.post.pk).image_width)
@@ -0,0 +1,114 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Полный проход по таблице без «USING ... INDEX»: «SCAN posts_post»,
+# а в SQLite до 3.36 — «SCAN TABLE posts_post»; у обоих может быть «AS U0».
+FULL_SCAN = re.compile(
+    r'\bSCAN (?:TABLE )?\w+(?: AS \w+)?$', re.MULTILINE
+)
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+class QueryPlanTest(TestCase):
+    """Запросы лент идут по индексам, без полного прохода и сортировки."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        posts = [
+            Post.objects.create(
+                text=f'Пост {number}', author=cls.author, group=cls.group
+            )
+            for number in range(15)
+        ]
+        cls.post = posts[-1]
+        for number in range(25):
+            Comment.objects.create(
+                text=f'Комментарий {number}', author=cls.reader, post=cls.post
+            )
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def assert_indexed(self, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, 200)
+        with connection.cursor() as cursor:
+            for query in queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or 'posts_' not in sql:
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plan = '\n'.join(row[-1] for row in cursor.fetchall())
+                with self.subTest(url=url, sql=sql):
+                    self.assertIsNone(FULL_SCAN.search(plan), plan)
+                    self.assertNotIn(TEMP_SORT, plan)
+        return response
+
+    def test_full_scan_pattern(self):
+        """Полный проход узнаётся в планах старых и новых версий SQLite"""
+        for plan in (
+            'SCAN posts_post',
+            'SCAN TABLE posts_post',
+            'SCAN TABLE posts_post AS U0',
+        ):
+            with self.subTest(plan=plan):
+                self.assertIsNotNone(FULL_SCAN.search(plan))
+        for plan in (
+            'SCAN posts_post USING INDEX posts_post_author',
+            'SCAN TABLE posts_post USING COVERING INDEX posts_post_author',
+            'SEARCH posts_post USING INTEGER PRIMARY KEY (rowid=?)',
+            'SCAN CONSTANT ROW',
+        ):
+            with self.subTest(plan=plan):
+                self.assertIsNone(FULL_SCAN.search(plan))
+
+    def test_feeds_use_indexes(self):
+        urls = (
+            reverse('posts_page:index'),
+            reverse('posts_page:group_list', args=(self.group.slug,)),
+            reverse('posts_page:profile', args=(self.author.username,)),
+            reverse('posts_page:follow_index'),
+            reverse('posts_page:post_detail', args=(self.post.pk,)),
+        )
+        for url in urls:
+            self.assert_indexed(url)
+            self.assert_indexed(url, {'page': 2})
+
+    def test_cursor_pages_use_indexes(self):
+        urls = (
+            reverse('posts_page:index'),
+            reverse('posts_page:group_list', args=(self.group.slug,)),
+            reverse('posts_page:profile', args=(self.author.username,)),
+        )
+        for url in urls:
+            response = self.assert_indexed(url, {'cursor': ''})
+            self.assert_indexed(
+                url, {'cursor': response.context['page_obj'].next_cursor}
+            )
+
+    def test_comment_pages_use_indexes(self):
+        url = reverse('posts_page:post_detail', args=(self.post.pk,))
+        response = self.assert_indexed(url)
+        self.assert_indexed(
+            url, {'comments_after': response.context['comments'].next_cursor}
+        )
@@ -0,0 +1,135 @@
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.models import KVStore
+
+from .. import media_gc
+from ..models import ImageVariant, Post
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+OLD = time.time() - 24 * 60 * 60
+
+
+def upload(name, content=SMALL_GIF):
+    return SimpleUploadedFile(name, content, content_type='image/gif')
+
+
+class ThumbnailCollectorTest(TransactionTestCase):
+    """Вне запроса миниатюры и копии режутся сразу после сохранения"""
+
+    def setUp(self) -> None:
+        self.media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+
+    def create_post(self, image):
+        post = Post.objects.create(text='тест', author=self.user, image=image)
+        # Только что загруженные картинки сигналы не удаляют.
+        path = post.image.storage.path(post.image.name)
+        os.utime(path, (OLD, OLD))
+        return post
+
+    def thumbnail(self, post):
+        name = get_thumbnail(post.image, '960x339', crop='center').name
+        self.assertTrue(name.startswith('cache/'))
+        return name
+
+    def test_deleted_post_drops_thumbnails(self):
+        """С последним постом удаляются миниатюры, копии и записи о них"""
+        post = self.create_post(upload('first.gif'))
+        thumbnail = self.thumbnail(post)
+        self.assertTrue(default_storage.exists(thumbnail))
+
+        post.delete()
+
+        self.assertFalse(default_storage.exists(thumbnail))
+        self.assertFalse(ImageVariant.objects.exists())
+        self.assertFalse(KVStore.objects.exists())
+
+    def test_shared_image_keeps_thumbnails(self):
+        """Миниатюры остаются, пока картинку использует другой пост"""
+        first = self.create_post(upload('first.gif'))
+        self.create_post(upload('second.gif'))
+        thumbnail = self.thumbnail(first)
+
+        first.delete()
+
+        self.assertTrue(default_storage.exists(thumbnail))
+        self.assertTrue(ImageVariant.objects.exists())
+
+    def test_replaced_image_drops_thumbnails(self):
+        """При замене картинки удаляются миниатюры прежней"""
+        post = self.create_post(upload('first.gif'))
+        thumbnail = self.thumbnail(post)
+
+        post.image = upload('other.gif', SMALL_GIF + b'\x00')
+        post.save()
+
+        self.assertFalse(default_storage.exists(thumbnail))
+        self.assertFalse(
+            ImageVariant.objects.exclude(source=post.image.name).exists()
+        )
+
+    def test_command_collects_orphans(self):
+        """Команда удаляет всё, что осталось без постов и без записей"""
+        post = self.create_post(upload('first.gif'))
+        thumbnail = self.thumbnail(post)
+        # Так картинку теряют мимо сигналов.
+        Post.objects.filter(pk=post.pk).update(image='')
+        stray = default_storage.save('cache/ab/cd/stray.jpg', upload('x'))
+        os.utime(default_storage.path(stray), (OLD, OLD))
+        fresh = default_storage.save('cache/ab/cd/fresh.jpg', upload('x'))
+        out = StringIO()
+
+        call_command('gc_thumbnails', '--max-size=0', stdout=out)
+
+        self.assertFalse(default_storage.exists(thumbnail))
+        self.assertFalse(default_storage.exists(stray))
+        self.assertTrue(default_storage.exists(fresh))
+        self.assertFalse(ImageVariant.objects.exists())
+        self.assertFalse(
+            KVStore.objects.filter(key__contains='||thumbnails||').exists()
+        )
+        self.assertIn(
+            'Миниатюр без постов: 1, файлов без записей: 1', out.getvalue()
+        )
+
+    def test_budget_evicts_least_recently_used(self):
+        """Сверх бюджета вытесняются давно не использовавшиеся миниатюры"""
+        old = self.create_post(upload('old.gif'))
+        new = self.create_post(upload('new.gif', SMALL_GIF + b'\x00'))
+        old_thumbnail, new_thumbnail = self.thumbnail(old), self.thumbnail(new)
+        os.utime(default_storage.path(old_thumbnail), (OLD, OLD))
+        old_size = default_storage.size(old_thumbnail)
+        report = media_gc.Report()
+
+        media_gc.enforce_budget(report, default_storage.size(new_thumbnail))
+
+        self.assertEqual(report.evicted, 1)
+        self.assertEqual(report.bytes_reclaimed, old_size)
+        self.assertFalse(default_storage.exists(old_thumbnail))
+        self.assertTrue(default_storage.exists(new_thumbnail))
@@ -0,0 +1,242 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='описание'
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.user, group=cls.group
+        )
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def get_twice(self, client, url, data=None):
+        """Два одинаковых запроса; возвращает число SQL-запросов второго."""
+        client.get(url, data)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, data)
+        return response, len(queries)
+
+    def test_anonymous_pages_served_from_cache(self):
+        """Повторный анонимный запрос отдаётся без обращений к базе"""
+        urls = (
+            reverse('posts_page:index'),
+            reverse('posts_page:group_list', args=(self.group.slug,)),
+            reverse('posts_page:profile', args=(self.user.username,)),
+            reverse('posts_page:post_detail', args=(self.post.pk,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response, queries = self.get_twice(self.guest_client, url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(queries, 0)
+
+    def test_authorized_pages_not_cached(self):
+        """Страницы для вошедших пользователей не кэшируются"""
+        response, _ = self.get_twice(
+            self.authorized_client, reverse('posts_page:index')
+        )
+
+        # Сессия и пользователь берутся из кэша, поэтому запросов к базе
+        # может и не быть, но страница каждый раз рендерится заново.
+        self.assertIsNotNone(response.context)
+
+    def test_query_string_is_part_of_key(self):
+        """Разные параметры запроса — разные страницы кэша"""
+        url = reverse('posts_page:index')
+        self.guest_client.get(url)
+
+        response = self.guest_client.get(url, {'page': 2})
+        cached = self.guest_client.get(url, {'page': 2})
+
+        self.assertIsNotNone(response.context)
+        self.assertIsNone(cached.context)
+
+    def test_changes_purge_dependent_pages(self):
+        """Изменения сбрасывают только страницы, которые от них зависят"""
+        index = reverse('posts_page:index')
+        detail = reverse('posts_page:post_detail', args=(self.post.pk,))
+        other = Post.objects.create(text='Другой пост', author=self.user)
+        other_detail = reverse('posts_page:post_detail', args=(other.pk,))
+        for url in (index, detail, other_detail):
+            self.guest_client.get(url)
+
+        Comment.objects.create(
+            text='Новый комментарий', author=self.user, post=self.post
+        )
+
+        self.assertContains(self.guest_client.get(detail), 'Новый комментарий')
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(index)
+            self.guest_client.get(other_detail)
+        self.assertEqual(len(queries), 0)
+
+        group_url = reverse('posts_page:group_list', args=(self.group.slug,))
+        self.guest_client.get(group_url)
+        self.group.title = 'Новое название'
+        self.group.save()
+
+        self.assertContains(
+            self.guest_client.get(group_url), 'Новое название'
+        )
+
+
+# Сессия и её пользователь берутся из кэша, запросы ниже — только от страниц.
+@override_settings(
+    USER_CACHE_TIMEOUT=60 * 60,
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+)
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='описание'
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.user, group=cls.group
+        )
+        cls.urls = (
+            reverse('posts_page:index'),
+            reverse('posts_page:group_list', args=(cls.group.slug,)),
+            reverse('posts_page:profile', args=(cls.user.username,)),
+            reverse('posts_page:post_detail', args=(cls.post.pk,)),
+        )
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_unchanged_pages_not_modified(self):
+        """Без изменений страница отвечает 304 по ETag, анонимам и по дате"""
+        for client in (self.guest_client, self.authorized_client):
+            for url in self.urls:
+                with self.subTest(url=url):
+                    response = client.get(url)
+                    etag = response['ETag']
+
+                    by_etag = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+                    self.assertEqual(by_etag.status_code, 304)
+                    self.assertEqual(by_etag['ETag'], etag)
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                by_date = self.guest_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                )
+                self.assertEqual(by_date.status_code, 304)
+
+    def test_authorized_pages_without_last_modified(self):
+        """Вошедшему страница отдаётся только с ETag"""
+        response = self.authorized_client.get(self.urls[0])
+
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_not_modified_without_render(self):
+        """Ответ 304 не рендерит шаблон"""
+        url = reverse('posts_page:post_detail', args=(self.post.pk,))
+        etag = self.authorized_client.get(url)['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(
+                url, HTTP_IF_NONE_MATCH=etag
+            )
+
+        self.assertEqual(response.status_code, 304)
+        self.assertIsNone(response.context)
+        # Сессия и пользователь берутся из кэша, остаётся сам пост.
+        self.assertEqual(len(queries), 1)
+
+    def test_changes_update_validators(self):
+        """Новый комментарий меняет ETag страницы поста"""
+        url = reverse('posts_page:post_detail', args=(self.post.pk,))
+        etag = self.guest_client.get(url)['ETag']
+
+        Comment.objects.create(
+            text='Новый комментарий', author=self.user, post=self.post
+        )
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_depends_on_user(self):
+        """Вошедший пользователь видит другую страницу — и другой ETag"""
+        url = reverse('posts_page:index')
+        etag = self.guest_client.get(url)['ETag']
+
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_follow_changes_profile_etag(self):
+        """После подписки страница автора не отдаётся из кэша браузера"""
+        author = User.objects.create_user(username='author')
+        url = reverse('posts_page:profile', args=(author.username,))
+        etag = self.authorized_client.get(url)['ETag']
+
+        Follow.objects.create(user=self.user, author=author)
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Отписаться')
+
+    def test_new_csrf_token_changes_etag(self):
+        """После нового входа страница с формой рендерится с новым токеном"""
+        url = reverse('posts_page:post_detail', args=(self.post.pk,))
+        self.authorized_client.cookies['csrftoken'] = 'a' * 64
+        etag = self.authorized_client.get(url)['ETag']
+
+        self.authorized_client.cookies['csrftoken'] = 'b' * 64
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_cursor_page_not_modified_before_query(self):
+        """Страница по курсору отвечает 304, не выбирая посты"""
+        author = User.objects.create_user(username='author')
+        Post.objects.create(text='Пост автора', author=author)
+        cursor = self.authorized_client.get(
+            reverse('posts_page:index'), {'cursor': ''}
+        ).context['page_obj']
+        for url, expected in (
+            (reverse('posts_page:index'), 0),
+            # Автор и подписка на него нужны для ETag.
+            (reverse('posts_page:profile', args=(author.username,)), 2),
+        ):
+            with self.subTest(url=url):
+                etag = self.authorized_client.get(
+                    url, {'cursor': ''}
+                )['ETag']
+
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.authorized_client.get(
+                        url, {'cursor': ''}, HTTP_IF_NONE_MATCH=etag
+                    )
+
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(len(queries), expected)
+        self.assertTrue(cursor.is_cursor)
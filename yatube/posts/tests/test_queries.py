@@ -0,0 +1,228 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from http import HTTPStatus
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from faker import Faker
+from mixer.backend.django import mixer
+from PIL import Image
+
+from .. import image_meta, variants
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+# Отчёт можно сравнивать между релизами: QUERY_REPORT=путь/к/файлу.json
+REPORT_PATH = os.getenv(
+    'QUERY_REPORT',
+    os.path.join(tempfile.gettempdir(), 'yatube_query_report.json'),
+)
+MAX_DURATION: float = 2.0
+# Картинка у каждого IMAGE_EVERY-го поста.
+IMAGE_EVERY = 3
+
+fake = Faker('ru_RU')
+
+
+def photo(number):
+    """Картинка с содержимым, своим для каждого number."""
+    buffer = BytesIO()
+    Image.new('RGB', (64, 32), (number % 256, number // 256, 0)).save(
+        buffer, format='PNG'
+    )
+    return SimpleUploadedFile(
+        f'{number}.png', buffer.getvalue(), content_type='image/png'
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class QueryBudgetTest(TestCase):
+    """Число SQL-запросов страниц не растёт вместе с объёмом данных.
+
+    Бюджеты и число запросов каждой страницы пишутся в отчёт REPORT_PATH.
+    """
+
+    report: dict = {}
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        Faker.seed(0)
+        cls.users = mixer.cycle(20).blend(User)
+        cls.reader, cls.author = cls.users[0], cls.users[1]
+        cls.groups = mixer.cycle(5).blend(
+            Group, title=fake.sentence, description=fake.text
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=fake.text(),
+                author=cls.users[number % len(cls.users)],
+                group=cls.groups[number % len(cls.groups)],
+                image=(
+                    photo(number) if (number + 1) % IMAGE_EVERY == 0
+                    else None
+                ),
+            )
+            for number in range(150)
+        ]
+        # Копии и размеры картинок готовит очередь миниатюр, у последнего
+        # поста — ещё нет: так лента выглядит сразу после загрузки.
+        for post in cls.posts[:-1]:
+            if post.image:
+                variants.generate(post.image.name)
+                image_meta.measure(post.image.name)
+        cls.popular_post = cls.posts[-1]
+        for number in range(60):
+            Comment.objects.create(
+                text=fake.sentence(),
+                author=cls.users[number % len(cls.users)],
+                post=cls.popular_post,
+            )
+        for author in cls.users[1:15]:
+            Follow.objects.create(user=cls.reader, author=author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        with open(REPORT_PATH, 'w', encoding='utf-8') as report:
+            json.dump(
+                cls.report, report, ensure_ascii=False, indent=2,
+                sort_keys=True,
+            )
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.popular_post.author)
+
+    def measure(self, name, request):
+        """Выполняет запрос и проверяет бюджет для маршрута name."""
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = request()
+            duration = time.perf_counter() - start
+        budget = settings.QUERY_BUDGETS[name]
+        QueryBudgetTest.report[name] = {
+            'queries': len(queries),
+            'budget': budget,
+            'duration_ms': round(duration * 1000, 1),
+        }
+        self.assertIn(
+            response.status_code, (HTTPStatus.OK, HTTPStatus.FOUND)
+        )
+        self.assertLessEqual(len(queries), budget, name)
+        self.assertLess(duration, MAX_DURATION, name)
+        return response
+
+    def test_index(self):
+        self.measure(
+            'posts_page:index',
+            lambda: self.client.get(reverse('posts_page:index')),
+        )
+
+    def test_group_list(self):
+        group = self.groups[0]
+        self.measure(
+            'posts_page:group_list',
+            lambda: self.client.get(
+                reverse('posts_page:group_list', args=(group.slug,))
+            ),
+        )
+
+    def test_profile(self):
+        self.measure(
+            'posts_page:profile',
+            lambda: self.client.get(
+                reverse('posts_page:profile', args=(self.author.username,))
+            ),
+        )
+
+    def test_post_detail(self):
+        self.measure(
+            'posts_page:post_detail',
+            lambda: self.client.get(
+                reverse(
+                    'posts_page:post_detail', args=(self.popular_post.pk,)
+                )
+            ),
+        )
+
+    def test_follow_index(self):
+        self.measure(
+            'posts_page:follow_index',
+            lambda: self.client.get(reverse('posts_page:follow_index')),
+        )
+
+    def test_search(self):
+        word = self.popular_post.text.split()[0]
+        self.measure(
+            'posts_page:search',
+            lambda: self.client.get(
+                reverse('posts_page:search'), {'q': word}
+            ),
+        )
+
+    def test_post_create(self):
+        self.measure(
+            'posts_page:post_create',
+            lambda: self.client.post(
+                reverse('posts_page:post_create'),
+                {'text': fake.text(), 'group': self.groups[0].pk},
+            ),
+        )
+
+    def test_post_edit(self):
+        self.measure(
+            'posts_page:post_edit',
+            lambda: self.author_client.post(
+                reverse('posts_page:post_edit', args=(self.popular_post.pk,)),
+                {'text': fake.text(), 'group': self.groups[1].pk},
+            ),
+        )
+
+    def test_add_comment(self):
+        self.measure(
+            'posts_page:add_comment',
+            lambda: self.client.post(
+                reverse(
+                    'posts_page:add_comment', args=(self.popular_post.pk,)
+                ),
+                {'text': fake.sentence()},
+            ),
+        )
+
+    def test_profile_follow(self):
+        self.measure(
+            'posts_page:profile_follow',
+            lambda: self.client.get(
+                reverse(
+                    'posts_page:profile_follow',
+                    args=(self.users[-1].username,),
+                )
+            ),
+        )
+
+    def test_profile_unfollow(self):
+        self.measure(
+            'posts_page:profile_unfollow',
+            lambda: self.client.get(
+                reverse(
+                    'posts_page:profile_unfollow',
+                    args=(self.author.username,),
+                )
+            ),
+        )
@@ -0,0 +1,116 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+from ..search import match_expression, search_posts
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='описание'
+        )
+        cls.post = Post.objects.create(
+            text='Весенние прогулки по набережной', author=cls.user
+        )
+        cls.other_post = Post.objects.create(
+            text='Рецепт борща', author=cls.user, group=cls.group
+        )
+        Comment.objects.create(
+            text='Гуляли по набережной всю ночь',
+            author=cls.user,
+            post=cls.other_post,
+        )
+
+    def setUp(self) -> None:
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def search(self, query):
+        return list(search_posts(Post.objects.all(), query)[:10])
+
+    def test_search_finds_word_forms(self):
+        """Триграммы находят слово в другой форме и в любом регистре"""
+        self.assertEqual(self.search('ВЕСЕННИЙ'), [])
+        self.assertEqual(self.search('весенн'), [self.post])
+        self.assertEqual(self.search('борщ'), [self.other_post])
+
+    def test_search_includes_comments(self):
+        """Пост находится и по тексту комментариев"""
+        self.assertCountEqual(
+            self.search('набережн'), [self.post, self.other_post]
+        )
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при изменении и удалении"""
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Осенние прогулки'
+        post.save()
+        self.assertEqual(self.search('весенн'), [])
+        self.assertEqual(self.search('осенн'), [post])
+
+        other_post = Post.objects.get(pk=self.other_post.pk)
+        other_post.comments.all().delete()
+        self.assertEqual(self.search('набережн'), [])
+
+        other_post.delete()
+        self.assertEqual(self.search('борщ'), [])
+
+    def test_query_is_escaped(self):
+        """Операторы FTS5 из ввода не ломают запрос"""
+        self.assertEqual(
+            match_expression('a "bc" OR де*ф'), '"""bc""" "де*ф"'
+        )
+        self.assertEqual(self.search('набережной" OR "борщ'), [])
+        self.assertEqual(self.search('по'), [])
+
+    def test_search_page(self):
+        """Страница поиска показывает найденные посты"""
+        response = self.authorized_client.get(
+            reverse('posts_page:search'), {'q': 'прогулки'}
+        )
+
+        self.assertTemplateUsed(response, 'posts/search.html')
+        self.assertEqual(list(response.context['page_obj']), [self.post])
+        self.assertEqual(response.context['page_obj'].paginator.count, 1)
+
+    @override_settings(CURSOR_PAGINATION=True)
+    def test_search_page_ignores_cursor(self):
+        """Результаты поиска листаются по номеру страницы, не по курсору"""
+        response = self.authorized_client.get(
+            reverse('posts_page:search'), {'q': 'набережн', 'cursor': 'x'}
+        )
+
+        self.assertEqual(response.context['page_obj'].paginator.count, 2)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт по индексу"""
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        self.client.force_login(admin)
+
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'набережн'}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, 2)
+
+    def test_admin_search_by_group_slug(self):
+        """Поиск в админке находит посты и по слагу группы"""
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        self.client.force_login(admin)
+
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'test-slug'}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.other_post]
+        )
@@ -0,0 +1,174 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from sorl.thumbnail import get_thumbnail
+
+from .. import media_gc, thumbnails
+from ..models import Post
+from ..storage import ContentHashStorage, is_content_name
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+OLD = time.time() - 24 * 60 * 60
+
+
+def upload(name, content=SMALL_GIF):
+    return SimpleUploadedFile(name, content, content_type='image/gif')
+
+
+class ContentHashStorageTest(TransactionTestCase):
+    def setUp(self) -> None:
+        self.media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.storage = Post.image.field.storage
+
+    def create_post(self, image):
+        return Post.objects.create(text='тест', author=self.user, image=image)
+
+    def age(self, name):
+        os.utime(self.storage.path(name), (OLD, OLD))
+
+    def test_file_named_by_content(self):
+        """Имя файла — SHA-256 содержимого с исходным расширением"""
+        post = self.create_post(upload('DSC_0206.GIF'))
+        digest = hashlib.sha256(SMALL_GIF).hexdigest()
+
+        self.assertEqual(post.image.name, f'posts/{digest[:2]}/{digest}.gif')
+        self.assertTrue(is_content_name(post.image.name))
+        with self.storage.open(post.image.name) as file:
+            self.assertEqual(file.read(), SMALL_GIF)
+
+    def test_identical_uploads_share_file(self):
+        """Одинаковые картинки под разными именами хранятся одним файлом"""
+        first = self.create_post(upload('DSC_0206.gif'))
+        second = self.create_post(upload('DSC_0206_IMl6Jf5.gif'))
+
+        self.assertEqual(first.image.name, second.image.name)
+        directory = os.path.dirname(self.storage.path(first.image.name))
+        self.assertEqual(os.listdir(directory), [
+            os.path.basename(first.image.name)
+        ])
+
+    def test_streamed_in_chunks(self):
+        """Большой файл пишется порциями и целиком"""
+        content = os.urandom(3 * ContentFile.DEFAULT_CHUNK_SIZE + 5)
+
+        name = ContentHashStorage(self.media_root).save(
+            'posts/big.bin', ContentFile(content)
+        )
+
+        with self.storage.open(name) as file:
+            self.assertEqual(file.read(), content)
+        self.assertEqual(
+            [entry for entry in os.listdir(os.path.dirname(
+                self.storage.path(name)
+            )) if entry.startswith('.upload-')],
+            [],
+        )
+
+    def test_file_removed_with_last_reference(self):
+        """Файл удаляется, только когда его не использует ни один пост"""
+        first = self.create_post(upload('first.gif'))
+        second = self.create_post(upload('second.gif'))
+        name = first.image.name
+
+        first.delete()
+        self.assertTrue(self.storage.exists(name))
+
+        self.age(name)
+        second.image = upload('other.gif', SMALL_GIF + b'\x00')
+        second.save()
+        self.assertFalse(self.storage.exists(name))
+
+    def test_fresh_file_left_to_collector(self):
+        """Недавно загруженный файл без постов удаляет сборщик мусора"""
+        post = self.create_post(upload('first.gif'))
+        name = post.image.name
+
+        post.delete()
+        self.assertTrue(self.storage.exists(name))
+
+        media_gc.collect()
+        self.assertTrue(self.storage.exists(name))
+
+        self.age(name)
+        report = media_gc.collect()
+        self.assertFalse(self.storage.exists(name))
+        self.assertEqual(report.orphan_images, 1)
+
+    def test_upload_protects_file_from_release(self):
+        """Повторная загрузка не даёт удалить файл, который освобождается"""
+        name = self.create_post(upload('first.gif')).image.name
+        self.age(name)
+
+        self.assertEqual(self.storage.save('posts/second.gif', upload(
+            'second.gif'
+        )), name)
+
+        self.assertFalse(self.storage.delete_stale(name, 60))
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(
+            [entry for entry in os.listdir(os.path.dirname(
+                self.storage.path(name)
+            )) if entry.startswith('.')],
+            [],
+        )
+
+    def test_thumbnails_shared(self):
+        """Миниатюра одинаковой картинки режется один раз"""
+        first = self.create_post(upload('first.gif'))
+        second = self.create_post(upload('second.gif'))
+        thumbnails.generate(first.image.name, '960x339', {'crop': 'center'})
+
+        image = get_thumbnail(second.image, '960x339', crop='center')
+
+        self.assertNotEqual(image.url, second.image.url)
+        self.assertEqual(
+            image.url,
+            get_thumbnail(first.image, '960x339', crop='center').url,
+        )
+
+    def test_dedupe_images_command(self):
+        """Команда переносит старые файлы и сливает одинаковые"""
+        legacy = FileSystemStorage(self.media_root)
+        names = [
+            legacy.save('posts/DSC_0206.JPG', ContentFile(SMALL_GIF)),
+            legacy.save('posts/DSC_0206.JPG', ContentFile(SMALL_GIF)),
+        ]
+        for name in names:
+            Post.objects.create(text='тест', author=self.user, image=name)
+
+        call_command('dedupe_images', stdout=StringIO())
+
+        images = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(images), 1)
+        self.assertTrue(is_content_name(images.pop()))
+        for name in names:
+            self.assertFalse(legacy.exists(name))
@@ -0,0 +1,94 @@
+import shutil
+import tempfile
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from sorl.thumbnail import get_thumbnail
+
+from .. import thumbnails
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class DeferredThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+        cls.post = Post.objects.create(
+            text='тест',
+            author=cls.user,
+            image=SimpleUploadedFile(
+                name='thumb.gif', content=small_gif, content_type='image/gif'
+            ),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def test_original_shown_until_thumbnail_ready(self):
+        """Пока миниатюры нет, тег отдаёт исходную картинку"""
+        image = get_thumbnail(self.post.image, '960x339', crop='center')
+
+        self.assertEqual(image.url, self.post.image.url)
+        self.assertEqual((image.width, image.height), (960, 339))
+
+    def test_generated_thumbnail_is_used(self):
+        """После фоновой генерации тег отдаёт готовую миниатюру"""
+        thumbnails.generate(
+            self.post.image.name, '960x339', {'crop': 'center'}
+        )
+
+        image = get_thumbnail(self.post.image, '960x339', crop='center')
+
+        self.assertNotEqual(image.url, self.post.image.url)
+        self.assertTrue(image.url.startswith(settings.MEDIA_URL + 'cache/'))
+
+
+@override_settings(THUMBNAIL_WORKERS=2)
+class ThumbnailQueueTest(SimpleTestCase):
+    def run_tasks(self):
+        threads = []
+        thumbnails.start_queue()
+        for key in ('first', 'second', 'first'):
+            thumbnails.enqueue(
+                key, lambda: threads.append(threading.current_thread())
+            )
+        thumbnails.run_queue()
+        thumbnails.flush()
+        return threads
+
+    def test_tasks_run_in_pool(self):
+        """Задачи запроса выполняются в пуле потоков, каждая один раз"""
+        threads = self.run_tasks()
+
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(threading.current_thread(), threads)
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_tasks_run_inline_without_pool(self):
+        """Без пула задачи выполняются в потоке запроса"""
+        threads = self.run_tasks()
+
+        self.assertEqual(threads, [threading.current_thread()] * 2)
@@ -0,0 +1,155 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from .. import image_meta, variants
+from ..models import ImageVariant, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def photo(width, height, name='photo.jpg'):
+    buffer = BytesIO()
+    Image.effect_noise((width, height), 40).convert('RGB').save(
+        buffer, format='JPEG'
+    )
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageVariantTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            text='тест', author=cls.user, image=photo(1200, 800)
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def render(self, image):
+        return Template(
+            '{% load post_images %}{% picture image %}'
+        ).render(Context({'image': image}))
+
+    def test_variants_generated(self):
+        """Копии режутся всех ширин и форматов в пропорциях миниатюры"""
+        created = variants.generate(self.post.image.name)
+
+        self.assertEqual(
+            sorted((item.format, item.width, item.height) for item in created),
+            [
+                ('jpeg', 320, 113), ('jpeg', 640, 226), ('jpeg', 960, 339),
+                ('webp', 320, 113), ('webp', 640, 226), ('webp', 960, 339),
+            ],
+        )
+        for item in created:
+            with default_storage.open(item.file.name) as file:
+                image = Image.open(file)
+                self.assertEqual(image.size, (item.width, item.height))
+                self.assertEqual(image.format, item.format.upper())
+
+    def test_no_upscaling(self):
+        """Копии не шире исходной картинки"""
+        post = Post.objects.create(
+            text='тест', author=self.user, image=photo(500, 300, 'small.jpg')
+        )
+
+        created = variants.generate(post.image.name)
+
+        self.assertEqual({item.width for item in created}, {320})
+
+    def test_generated_once(self):
+        """Готовые копии не режутся повторно, а с force — заново"""
+        variants.generate(self.post.image.name)
+
+        self.assertEqual(variants.generate(self.post.image.name), [])
+        self.assertEqual(
+            len(variants.generate(self.post.image.name, force=True)), 6
+        )
+        self.assertEqual(
+            ImageVariant.objects.filter(source=self.post.image.name).count(),
+            6,
+        )
+
+    def test_picture_tag(self):
+        """Тег выводит <picture> с srcset и размерами картинки"""
+        variants.generate(self.post.image.name)
+
+        html = self.render(self.post.image)
+
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn(' 320w, ', html)
+        self.assertIn('width="960" height="339"', html)
+        self.assertIn('.jpg 960w"', html)
+
+    def test_picture_tag_falls_back_to_thumbnail(self):
+        """Пока копий нет, тег выводит одиночную миниатюру"""
+        html = self.render(self.post.image)
+
+        self.assertNotIn('<picture>', html)
+        self.assertIn('width="960" height="339"', html)
+
+    def test_picture_tag_uses_stored_size(self):
+        """Без копий тег берёт размеры из полей поста и не зовёт sorl"""
+        image_meta.measure(self.post.image.name)
+        post = Post.objects.get(pk=self.post.pk)
+
+        with CaptureQueriesContext(connection) as queries:
+            html = self.render(post.image)
+
+        self.assertIn(f'src="{post.image.url}"', html)
+        self.assertIn('width="960" height="339"', html)
+        self.assertFalse(
+            any('thumbnail_kvstore' in query['sql'] for query in queries)
+        )
+
+    @override_settings(THUMBNAIL_UPSCALE=False)
+    def test_picture_tag_stored_size_not_upscaled(self):
+        """Маленькая картинка не растягивается до размеров миниатюры"""
+        post = Post.objects.create(
+            text='тест', author=self.user, image=photo(500, 300, 'small.jpg')
+        )
+        image_meta.measure(post.image.name)
+        post.refresh_from_db()
+
+        self.assertIn('width="500" height="300"', self.render(post.image))
+
+    def test_feed_loads_variants_once(self):
+        """Лента читает копии всех постов страницы одним запросом"""
+        for number in range(3):
+            post = Post.objects.create(
+                text='тест', author=self.user,
+                image=photo(1000, 400, f'{number}.jpg'),
+            )
+            variants.generate(post.image.name)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts_page:index'))
+
+        self.assertContains(response, '<picture>', count=3)
+        self.assertEqual(
+            sum('posts_imagevariant' in query['sql'] for query in queries),
+            1,
+        )
@@ -1,6 +1,9 @@
+import base64
+import json
 import shutil
 import tempfile
 from http import HTTPStatus
+from io import StringIO
 from xml.etree.ElementTree import Comment
 
 from django import forms
@@ -8,11 +11,16 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from users.models import Profile
+
+from ..cache import INDEX_FEED
+from ..counters import post_count, rebuild_counters
 from ..forms import PostForm
-from ..models import Comment, Follow, Group, Post
+from ..models import Comment, FeedEntry, Follow, Group, Post
 
 User = get_user_model()
 
@@ -165,6 +173,24 @@ class ViewsURLTest(TestCase):
         self.assertEqual(test_image, self.post.image)
         self.assertEqual(comments[0], self.comment)
 
+    def test_post_detail_comments_loaded_in_chunks(self):
+        """Комментарии выводятся порциями, следующая — по comments_after"""
+        for number in range(settings.SHOWING_COMMENTS + 4):
+            Comment.objects.create(
+                author=self.user, post=self.post, text=f'комментарий {number}'
+            )
+        url = reverse(self.url_post_detail['name'], args=(self.post.pk,))
+
+        first_chunk = self.guest_client.get(url).context.get('comments')
+        next_chunk = self.guest_client.get(
+            url, {'comments_after': first_chunk.next_cursor}
+        ).context.get('comments')
+
+        self.assertEqual(len(first_chunk), settings.SHOWING_COMMENTS)
+        self.assertEqual(len(next_chunk), 5)
+        self.assertFalse(next_chunk.has_next())
+        self.assertFalse(set(first_chunk) & set(next_chunk))
+
     def test_post_create_and_edit_page_get_correct_form(self):
         """Шаблоны post_create и post_edit
         сформированы с правильными полями."""
@@ -249,6 +275,77 @@ class ViewsURLTest(TestCase):
         self.assertEqual(response.status_code, HTTPStatus.OK)
         self.assertNotIn(test_post, response.context.get('page_obj'))
 
+    def test_posts_count_kept_by_signals(self):
+        """Счётчики постов и комментариев меняются сигналами"""
+        self.guest_client.get(reverse(self.url_index['name']))
+        url = reverse(self.url_profile['name'], args=self.url_profile['arg'])
+        response = self.guest_client.get(url)
+        self.assertEqual(response.context['author'].profile.post_count, 1)
+
+        new_post = Post.objects.create(
+            text='ещё пост', author=self.user, group=self.group
+        )
+        Comment.objects.create(author=self.user, post=new_post, text='ок')
+        response = self.guest_client.get(url)
+        new_post.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(response.context['author'].profile.post_count, 2)
+        self.assertEqual(new_post.comment_count, 1)
+        self.assertEqual(self.group.post_count, 2)
+
+        new_post.delete()
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.post_count, 1)
+        # Общее число постов хранится в кэше.
+        with self.assertNumQueries(0):
+            count = post_count(INDEX_FEED, None)
+        self.assertEqual(count, 1)
+
+    def test_rebuild_counters_repairs_drift(self):
+        """Команда rebuild_counters исправляет расхождение счётчиков"""
+        Group.objects.update(post_count=100)
+        Post.objects.update(comment_count=100)
+        Profile.objects.update(post_count=0, follower_count=5)
+
+        call_command('rebuild_counters', batch_size=1, stdout=StringIO())
+
+        self.group.refresh_from_db()
+        self.post.refresh_from_db()
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual(self.group.post_count, 1)
+        self.assertEqual(self.post.comment_count, 1)
+        self.assertEqual(profile.post_count, 1)
+        self.assertEqual(profile.follower_count, 0)
+
+    def test_rebuild_counters_creates_missing_profiles(self):
+        """Пересчёт создаёт профили пачкой больше предела INSERT в SQLite"""
+        User.objects.bulk_create(
+            User(username=f'user{number}') for number in range(600)
+        )
+
+        rebuild_counters(batch_size=1000)
+
+        self.assertFalse(User.objects.filter(profile__isnull=True).exists())
+
+    def test_author_without_profile(self):
+        """Страницы автора без профиля открываются и создают профиль"""
+        # Так пользователи и посты попадают в базу мимо сигналов.
+        User.objects.bulk_create([User(username='loaded')])
+        author = User.objects.get(username='loaded')
+        Post.objects.bulk_create([Post(text='тест', author=author)])
+        post = author.posts.get()
+        cache.clear()
+
+        for url in (
+            reverse('posts_page:profile', args=(author.username,)),
+            reverse('posts_page:post_detail', args=(post.pk,)),
+        ):
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+        profile = Profile.objects.get(user=author)
+        self.assertEqual(profile.post_count, 1)
+
     def test_new_post_in_correct_group_profile_index(self):
         """Новый пост отображается на главной странице,
         в выбранной группе, в профайле пользователя"""
@@ -306,9 +403,12 @@ class PaginatorTest(TestCase):
                 Post(text='тест', author=cls.user, group=cls.group)
             )
         Post.objects.bulk_create(created_posts)
+        # bulk_create не вызывает сигналы, счётчики пересчитываются явно.
+        rebuild_counters(batch_size=100)
 
     def setUp(self) -> None:
         self.guest_client = Client()
+        cache.clear()
 
     def test_paginator_show_correct_number_page(self):
         """Паджинатор показывает 10 постов"""
@@ -319,6 +419,8 @@ class PaginatorTest(TestCase):
         )
 
         self.assertEqual(response.status_code, HTTPStatus.OK)
+        # Повторный запрос отдала бы страница из кэша, без контекста.
+        cache.clear()
 
         for url in PaginatorTest.url_templates_context:
             with self.subTest(reverse_name=url['name']):
@@ -349,6 +451,65 @@ class PaginatorTest(TestCase):
         self.assertEqual(response.status_code, HTTPStatus.OK)
         self.assertEqual(posts_on_page, expected_count)
 
+    def test_cursor_paginator_walks_feed(self):
+        """Паджинатор по курсору проходит ленту вперёд и назад"""
+        for url in PaginatorTest.url_templates_context:
+            with self.subTest(reverse_name=url['name']):
+                cache.clear()
+                path = reverse(url['name'], args=url['arg'])
+                first_page = self.guest_client.get(
+                    path, {'cursor': ''}
+                ).context.get('page_obj')
+                second_page = self.guest_client.get(
+                    path, {'cursor': first_page.next_cursor}
+                ).context.get('page_obj')
+                cache.clear()
+                previous_page = self.guest_client.get(
+                    path, {'cursor': second_page.previous_cursor}
+                ).context.get('page_obj')
+
+                self.assertEqual(len(first_page), 10)
+                self.assertEqual(len(second_page), 2)
+                self.assertFalse(second_page.has_next())
+                self.assertFalse(
+                    set(first_page) & set(second_page)
+                )
+                self.assertEqual(list(previous_page), list(first_page))
+                self.assertFalse(previous_page.has_previous())
+
+    def test_cursor_paginator_ignores_broken_cursor(self):
+        """Испорченный курсор открывает первую страницу"""
+        response = self.guest_client.get(
+            reverse(self.url_index['name']), {'cursor': 'не-курсор'}
+        )
+
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(len(response.context.get('page_obj')), 10)
+
+    def test_cursor_paginator_validates_position(self):
+        """Курсор с неверными значениями позиции открывает первую страницу"""
+        positions = (
+            ['2020-01-01T00:00:00', 'x', 'y'],
+            ['2020-01-01T00:00:00', 1],
+            ['не-дата', 1, 1],
+            ['2020-01-01T00:00:00', None, 1],
+            ['2020-01-01T00:00:00', 1, 10 ** 30],
+            ['2020-01-01T00:00:00', -10 ** 30, 1],
+            ['2020-01-01T00:00:00', 1, 1e30],
+            {'p': 1},
+        )
+        for position in positions:
+            with self.subTest(position=position):
+                cursor = base64.urlsafe_b64encode(
+                    json.dumps({'p': position}).encode()
+                ).decode()
+                response = self.guest_client.get(
+                    reverse(self.url_index['name']), {'cursor': cursor}
+                )
+
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertEqual(len(response.context.get('page_obj')), 10)
+
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class CacheTest(TestCase):
@@ -379,19 +540,75 @@ class CacheTest(TestCase):
         response = self.guest_client.get(reverse(self.url_index['name']))
         cache_with_post = response.content
 
+        # Изменение в обход сигналов не сбрасывает кэш.
+        Post.objects.filter(pk=created_post.pk).update(text='без сигналов')
+        response = self.guest_client.get(reverse(self.url_index['name']))
+        cache_update_post = response.content
+
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(cache_with_post, cache_update_post)
+
         created_post.delete()
         response = self.guest_client.get(reverse(self.url_index['name']))
         cache_delete_post = response.content
 
         self.assertEqual(response.status_code, HTTPStatus.OK)
-        self.assertEqual(cache_with_post, cache_delete_post)
+        self.assertNotEqual(cache_with_post, cache_delete_post)
 
+    def test_cache_main_page_depends_on_page(self):
+        """Каждая страница главной кэшируется отдельно"""
         cache.clear()
-        response = self.guest_client.get(reverse(self.url_index['name']))
-        clear_cache = response.content
+        for number in range(12):
+            Post.objects.create(text=f'пост номер {number}', author=self.user)
 
-        self.assertEqual(response.status_code, HTTPStatus.OK)
-        self.assertNotEqual(cache_with_post, clear_cache)
+        first_page = self.guest_client.get(
+            reverse(self.url_index['name'])
+        ).content
+        second_page = self.guest_client.get(
+            reverse(self.url_index['name']), {'page': 2}
+        ).content
+
+        self.assertIn('пост номер 11'.encode(), first_page)
+        self.assertNotIn('пост номер 11'.encode(), second_page)
+        self.assertIn('пост номер 0'.encode(), second_page)
+
+    def test_author_name_change_purges_feeds(self):
+        """Новое имя автора сразу видно в общих лентах"""
+        cache.clear()
+        group = Group.objects.create(
+            title='Группа', slug='name-change', description='описание'
+        )
+        Post.objects.create(text='пост', author=self.user, group=group)
+        urls = (
+            reverse(self.url_index['name']),
+            reverse('posts_page:group_list', args=(group.slug,)),
+        )
+        for url in urls:
+            self.guest_client.get(url)
+
+        self.user.first_name = 'Новое'
+        self.user.last_name = 'Имя'
+        self.user.save()
+
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertIn(
+                    'Новое Имя'.encode(), self.guest_client.get(url).content
+                )
+
+    def test_login_keeps_feeds_cached(self):
+        """Вход пользователя не сбрасывает общие ленты"""
+        cache.clear()
+        Post.objects.create(text='пост', author=self.user)
+        self.guest_client.get(reverse(self.url_index['name']))
+
+        User.objects.create_user(username='cached', password='pass')
+        self.assertTrue(
+            self.client.login(username='cached', password='pass')
+        )
+
+        with self.assertNumQueries(0):
+            self.guest_client.get(reverse(self.url_index['name']))
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -495,3 +712,76 @@ class FollowViewTest(TestCase):
 
         self.assertEqual(response.status_code, HTTPStatus.OK)
         self.assertNotIn(post, following_list)
+
+    def test_unfollow_removes_posts_from_feed(self):
+        """После отписки посты автора пропадают из ленты"""
+        post = Post.objects.create(text='тест подписки', author=self.user)
+        Follow.objects.create(user=self.following_user, author=self.user)
+        self.follower_client.get(
+            reverse(self.url_unfollow['name'], args=self.url_unfollow['arg'])
+        )
+
+        response = self.follower_client.get(
+            reverse(self.url_follow_index['name'])
+        )
+
+        self.assertNotIn(post, response.context.get('page_obj'))
+        self.assertFalse(
+            FeedEntry.objects.filter(user=self.following_user).exists()
+        )
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_popular_author_posts_pulled_into_feed(self):
+        """Посты популярного автора не раскладываются по лентам,
+        но видны подписчикам"""
+        Follow.objects.create(user=self.following_user, author=self.user)
+        post = Post.objects.create(text='тест подписки', author=self.user)
+
+        response = self.follower_client.get(
+            reverse(self.url_follow_index['name'])
+        )
+
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        self.assertIn(post, response.context.get('page_obj'))
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_author_no_longer_popular_backfills_feeds(self):
+        """Когда автор перестаёт быть популярным, посты, которые он
+        написал популярным, попадают в ленты подписчиков"""
+        Follow.objects.create(user=self.following_user, author=self.user)
+        Follow.objects.create(user=self.unfollowing_user, author=self.user)
+        post = Post.objects.create(text='тест подписки', author=self.user)
+        self.assertTrue(Profile.objects.get(user=self.user).feed_pull)
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+
+        Follow.objects.filter(user=self.unfollowing_user).delete()
+
+        self.assertFalse(Profile.objects.get(user=self.user).feed_pull)
+        self.assertTrue(
+            FeedEntry.objects.filter(
+                user=self.following_user, post=post
+            ).exists()
+        )
+        response = self.follower_client.get(
+            reverse(self.url_follow_index['name'])
+        )
+        self.assertIn(post, response.context.get('page_obj'))
+
+    @override_settings(FEED_BACKFILL_SIZE=2)
+    def test_follow_backfills_only_latest_posts(self):
+        """При подписке в ленту попадают только последние
+        FEED_BACKFILL_SIZE постов автора, новые — все"""
+        oldest, *latest = [
+            Post.objects.create(text=f'пост {number}', author=self.user)
+            for number in range(3)
+        ]
+        Follow.objects.create(user=self.following_user, author=self.user)
+        new_post = Post.objects.create(text='новый пост', author=self.user)
+
+        response = self.follower_client.get(
+            reverse(self.url_follow_index['name'])
+        )
+
+        page = list(response.context.get('page_obj'))
+        self.assertEqual(set(page), {new_post, *latest})
+        self.assertNotIn(oldest, page)
@@ -0,0 +1,186 @@
+"""Отложенная подготовка миниатюр картинок постов.
+
+Миниатюры создаются не во время рендера страницы, а после того, как ответ
+уже отдан клиенту: задачи копятся за время запроса и по сигналу
+request_finished уходят в небольшой пул потоков (THUMBNAIL_WORKERS), так
+что воркер сразу берётся за следующий запрос. Пока миниатюра не готова,
+тег {% thumbnail %} отдаёт исходную картинку с размерами миниатюры. Вне
+запроса (shell, команды) миниатюры создаются сразу после фиксации
+транзакции, а flush() дожидается задач, уже отданных пулу.
+"""
+import logging
+import threading
+from concurrent import futures
+
+from django.conf import settings
+from django.db import connections, transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.parsers import parse_geometry
+
+from . import image_meta, variants
+from .storage import content_storage
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+
+
+class _ThumbnailName(Exception):
+    """Имя миниатюры известно, создавать её сейчас не нужно."""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.name = name
+
+
+class DeferredThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl-thumbnail, который не режет картинки во время запроса.
+
+    Опции с умолчаниями и имя миниатюры считает сам sorl-thumbnail:
+    get_thumbnail прерывается на расчёте имени, до открытия исходника.
+    """
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if getattr(_local, 'generating', False) or not file_:
+            return super().get_thumbnail(file_, geometry_string, **options)
+        _local.naming = True
+        try:
+            super().get_thumbnail(file_, geometry_string, **options)
+        except _ThumbnailName as thumbnail_name:
+            name = thumbnail_name.name
+        finally:
+            _local.naming = False
+        cached = default.kvstore.get(ImageFile(name, default.storage))
+        if cached:
+            return cached
+        source = ImageFile(file_)
+        schedule(source.name, geometry_string, options)
+        source.set_size(parse_geometry(geometry_string))
+        return source
+
+    def _get_thumbnail_filename(self, source, geometry_string, options):
+        name = super()._get_thumbnail_filename(
+            source, geometry_string, options
+        )
+        if getattr(_local, 'naming', False):
+            raise _ThumbnailName(name)
+        return name
+
+
+def generate(name, geometry_string, options):
+    """Создаёт миниатюру картинки поста синхронно, в текущем потоке."""
+    _local.generating = True
+    try:
+        # Ключ миниатюры зависит от хранилища исходника, поэтому оно
+        # должно совпадать с хранилищем поля Post.image.
+        default.backend.get_thumbnail(
+            ImageFile(name, content_storage), geometry_string, **options
+        )
+    except Exception:
+        logger.exception('Не удалось создать миниатюру %s', name)
+    finally:
+        _local.generating = False
+
+
+def generate_variants(name):
+    """Режет адаптивные копии картинки синхронно, в текущем потоке."""
+    try:
+        variants.generate(name)
+    except Exception:
+        logger.exception('Не удалось создать копии картинки %s', name)
+
+
+def measure_image(name):
+    """Запоминает в постах размеры и заглушку картинки name."""
+    try:
+        image_meta.measure(name)
+    except Exception:
+        logger.exception('Не удалось описать картинку %s', name)
+
+
+def start_queue():
+    """Начинает копить задачи текущего запроса."""
+    _local.queue = {}
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = futures.ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+    return _executor
+
+
+def _run(task):
+    try:
+        task()
+    finally:
+        # У потока пула свои соединения с базой, держать их незачем.
+        connections.close_all()
+
+
+def run_queue():
+    """Отдаёт пулу потоков задачи, накопленные за запрос.
+
+    При THUMBNAIL_WORKERS = 0 выполняет их сразу, в текущем потоке.
+    """
+    queue = getattr(_local, 'queue', None)
+    _local.queue = None
+    if not queue:
+        return
+    if not settings.THUMBNAIL_WORKERS:
+        for task in queue.values():
+            task()
+        return
+    executor = _get_executor()
+    for task in queue.values():
+        future = executor.submit(_run, task)
+        _pending.add(future)
+        future.add_done_callback(_pending.discard)
+
+
+def flush(timeout=None) -> None:
+    """Дожидается задач, отданных пулу потоков."""
+    futures.wait(list(_pending), timeout)
+
+
+def enqueue(key, task):
+    """Ставит task в очередь после фиксации транзакции.
+
+    Задачи с одинаковым key за один запрос выполняются один раз.
+    """
+    def submit():
+        queue = getattr(_local, 'queue', None)
+        if queue is None:
+            task()
+        else:
+            queue.setdefault(key, task)
+
+    transaction.on_commit(submit)
+
+
+def schedule(name, geometry_string, options):
+    """Ставит миниатюру в очередь после фиксации транзакции."""
+    enqueue(
+        (name, geometry_string, repr(sorted(options.items()))),
+        lambda: generate(name, geometry_string, options),
+    )
+
+
+def schedule_post(post):
+    """Ставит в очередь миниатюры, адаптивные копии и описание картинки."""
+    if not post.image:
+        return
+    for geometry_string, options in settings.THUMBNAIL_PREGENERATE:
+        schedule(post.image.name, geometry_string, options)
+    name = post.image.name
+    enqueue(('variants', name), lambda: generate_variants(name))
+    enqueue(('meta', name), lambda: measure_image(name))
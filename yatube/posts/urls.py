@@ -11,6 +11,7 @@ from .views import (
     ProfileFollowView,
     ProfileListView,
     ProfileUnfollowView,
+    SearchView,
 )
 
 app_name = "posts_page"
@@ -24,6 +25,7 @@ urlpatterns = [
     path("posts/<int:post_id>/edit/", PostEditView.as_view(), name="post_edit"),
     path("posts/<int:post_id>/comment/", AddCommentView.as_view(), name="add_comment"),
     path("follow/", FollowListView.as_view(), name="follow_index"),
+    path("search/", SearchView.as_view(), name="search"),
     path(
         "profile/<str:username>/follow/",
         ProfileFollowView.as_view(),
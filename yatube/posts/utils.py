@@ -1,5 +1,12 @@
+import base64
+import binascii
+import json
+
 from django.conf import settings
-from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.core.exceptions import ValidationError
+from django.core.paginator import (EmptyPage, Page, PageNotAnInteger,
+                                   Paginator)
+from django.db.models import Q
 
 
 class PaginatorMixin(object):
@@ -17,3 +24,170 @@ class PaginatorMixin(object):
             queryset_paginated = paginator.page(paginator.num_pages)
 
         return queryset_paginated
+
+
+class CountingPaginator(Paginator):
+    """Паджинатор с заранее известным числом объектов.
+
+    Число берётся из счётчика, поэтому страница не делает COUNT(*).
+    """
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count = count
+
+
+class CursorPage(Page):
+    """Страница ленты, полученная по курсору, а не по номеру."""
+
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+# Целые за пределами 64-битного знакового типа базы не принимают.
+MAX_INTEGER = 2 ** 63 - 1
+
+
+class CursorPaginator(Paginator):
+    """Паджинатор по ключу сортировки (keyset) вместо OFFSET.
+
+    Позиция в ленте передаётся непрозрачным токеном ?cursor=, поэтому
+    выборка любой страницы — это диапазонный проход по индексу,
+    без COUNT(*) и без пропуска всех предыдущих строк.
+    """
+
+    # Порядок Post.Meta.ordering плюс pk для однозначности. pk идёт по
+    # возрастанию: так же, как rowid в конце индексов лент SQLite.
+    ordering = ('-pub_date', 'author_id', 'pk')
+
+    def __init__(self, object_list, per_page, ordering=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        if ordering is not None:
+            self.ordering = ordering
+
+    def get_page(self, cursor):
+        position, backwards = self.decode_cursor(cursor)
+        if backwards and position is None:
+            backwards = False
+
+        queryset = self.object_list.order_by(*self._ordering(backwards))
+        if position is not None:
+            queryset = queryset.filter(self._after(position, backwards))
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if backwards:
+            if not has_more:
+                # Дошли до начала ленты — отдаём первую страницу целиком.
+                return self.get_page(None)
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or backwards:
+                next_cursor = self.encode_cursor(rows[-1], False)
+            if position is not None:
+                previous_cursor = self.encode_cursor(rows[0], True)
+        elif position is not None:
+            previous_cursor = self._encode(position, True)
+        return CursorPage(rows, self, next_cursor, previous_cursor)
+
+    def encode_cursor(self, obj, backwards):
+        return self._encode(
+            [getattr(obj, field.lstrip('-')) for field in self.ordering],
+            backwards,
+        )
+
+    def decode_cursor(self, cursor):
+        """Возвращает (позиция, направление); битый токен — первая страница.
+
+        Каждое значение позиции приводится к типу своего поля, а целые
+        проверяются на диапазон базы, поэтому в запрос попадают только
+        корректные значения.
+        """
+        if not cursor:
+            return None, False
+        try:
+            padding = '=' * (-len(cursor) % 4)
+            data = json.loads(
+                base64.urlsafe_b64decode(cursor + padding).decode()
+            )
+            values = list(data['p'])
+            backwards = bool(data.get('b'))
+            if len(values) != len(self.ordering):
+                return None, False
+            position = [
+                self._field(name).to_python(value)
+                for name, value in zip(self.ordering, values)
+            ]
+        except (ValidationError, ValueError, KeyError, TypeError,
+                binascii.Error, UnicodeDecodeError):
+            return None, False
+        if None in position or any(
+            isinstance(value, int)
+            and not -MAX_INTEGER - 1 <= value <= MAX_INTEGER
+            for value in position
+        ):
+            return None, False
+        return position, backwards
+
+    def _field(self, name):
+        opts = self.object_list.model._meta
+        name = name.lstrip('-')
+        return opts.pk if name == 'pk' else opts.get_field(name)
+
+    def _encode(self, position, backwards):
+        values = [position[0].isoformat()] + list(position[1:])
+        data = json.dumps({'p': values, 'b': int(backwards)})
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    def _ordering(self, backwards):
+        if not backwards:
+            return self.ordering
+        return tuple(
+            field[1:] if field.startswith('-') else '-' + field
+            for field in self.ordering
+        )
+
+    def _after(self, position, backwards):
+        """Условие «строго после позиции» в заданном порядке сортировки."""
+        condition = Q()
+        equal = {}
+        for field, value in zip(self._ordering(backwards), position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+
+def paginate_posts(request, queryset, count=None, allow_cursor=True):
+    """Страница ленты: по курсору (?cursor=) или по номеру (?page=).
+
+    Если число постов count известно из счётчика, COUNT(*) не выполняется.
+    С allow_cursor=False страница выбирается только по номеру: так листаются
+    выдачи, упорядоченные не по дате, например результаты поиска.
+    """
+    cursor = request.GET.get('cursor')
+    if allow_cursor and (cursor is not None or settings.CURSOR_PAGINATION):
+        paginator = CursorPaginator(queryset, settings.SHOWING_POSTS)
+        return paginator.get_page(cursor)
+    if count is None:
+        paginator = Paginator(queryset, settings.SHOWING_POSTS)
+    else:
+        paginator = CountingPaginator(queryset, settings.SHOWING_POSTS, count)
+    return paginator.get_page(request.GET.get('page'))
@@ -0,0 +1,106 @@
+"""Адаптивные копии картинок постов для <picture> и srcset.
+
+Для каждой картинки заранее режутся копии нескольких ширин
+(IMAGE_VARIANT_WIDTHS) в нескольких форматах (IMAGE_VARIANT_FORMATS,
+последний — запасной для старых браузеров) с тем же кадрированием, что и
+миниатюра в ленте. Копии записываются в таблицу ImageVariant, и браузер
+сам выбирает подходящую по srcset, поэтому телефон не скачивает картинку
+шириной в 960 точек. Копии готовит очередь миниатюр после ответа на
+запрос; во время рендера ничего не режется.
+"""
+import logging
+import posixpath
+from collections import defaultdict
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .models import ImageVariant
+from .storage import content_storage
+
+logger = logging.getLogger(__name__)
+
+MIME_TYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+
+def variant_name(source, width, format_) -> str:
+    """'variants/posts/3f/3f…9a/640.webp'."""
+    stem = posixpath.splitext(source)[0]
+    return f'variants/{stem}/{width}.{EXTENSIONS[format_]}'
+
+
+def _widths(image):
+    # Копии шире исходника не нужны, но самая узкая есть всегда.
+    widths = sorted(settings.IMAGE_VARIANT_WIDTHS)
+    return [width for width in widths if width <= image.width] or widths[:1]
+
+
+def _encode(image, format_):
+    if format_ == 'jpeg' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    buffer = BytesIO()
+    image.save(
+        buffer,
+        format=format_.upper(),
+        quality=settings.IMAGE_VARIANT_QUALITY,
+        optimize=format_ == 'jpeg',
+    )
+    return buffer.getvalue()
+
+
+def generate(source, force=False) -> list:
+    """Режет копии картинки source; возвращает созданные ImageVariant.
+
+    Имя файла картинки — хэш её содержимого, поэтому готовые копии не
+    устаревают и повторно не режутся, если не передан force.
+    """
+    if not force and ImageVariant.objects.filter(source=source).exists():
+        return []
+    try:
+        with content_storage.open(source) as file:
+            image = ImageOps.exif_transpose(Image.open(file))
+            image.load()
+    except (OSError, ValueError):
+        logger.exception('Не удалось открыть картинку %s', source)
+        return []
+    delete(source)
+    ratio_width, ratio_height = settings.IMAGE_VARIANT_RATIO
+    variants = []
+    for width in _widths(image):
+        height = max(round(width * ratio_height / ratio_width), 1)
+        resized = ImageOps.fit(image, (width, height), Image.LANCZOS)
+        for format_ in settings.IMAGE_VARIANT_FORMATS:
+            name = default_storage.save(
+                variant_name(source, width, format_),
+                ContentFile(_encode(resized, format_)),
+            )
+            variants.append(ImageVariant(
+                source=source,
+                format=format_,
+                width=width,
+                height=height,
+                file=name,
+            ))
+    return ImageVariant.objects.bulk_create(variants)
+
+
+def delete(source) -> None:
+    """Удаляет копии картинки source вместе с файлами."""
+    variants = ImageVariant.objects.filter(source=source)
+    for name in variants.values_list('file', flat=True):
+        default_storage.delete(name)
+    variants.delete()
+
+
+def variants_for(sources) -> dict:
+    """Копии картинок одним запросом: {source: {format: [по ширине]}}."""
+    found = {source: defaultdict(list) for source in sources}
+    for variant in ImageVariant.objects.filter(source__in=found):
+        found[variant.source][variant.format].append(variant)
+    return found
@@ -1,44 +1,99 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.utils.decorators import method_decorator
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import http_date
 from django.views.generic import (CreateView, DetailView, ListView, UpdateView,
                                   View)
 
-from .forms import CommentForm, PostForm
+from core.routers import ReplicaReadMixin
+
+from .cache import INDEX_FEED, feed_key, page_validators
+from .counters import get_profile, post_count
+from .feed import follow_posts
+from .forms import CommentForm, PostForm, SearchForm
 from .models import Comment, Follow, Group, Post, User
+from .search import search_posts
+from .utils import CursorPaginator, paginate_posts
+
+
+class PageCacheMixin:
+    """Страница, которая меняется только вместе со своими лентами.
+
+    Для анонимов она целиком кэшируется, а всем отдаётся с ETag, анонимам
+    ещё и с Last-Modified: повторный запрос без изменений получает 304
+    до выборки постов и без рендера.
+    """
+
+    def get_page_cache_feeds(self):
+        return ()
+
+    def get_page_cache_state(self):
+        """Что, кроме лент, меняет страницу для текущего пользователя."""
+        return ()
+
+    def get(self, request, *args, **kwargs):
+        feeds = self.get_page_cache_feeds()
+        request.page_cache_feeds = feeds
+        etag, last_modified = page_validators(
+            request, feeds, self.get_page_cache_state()
+        )
+        # Страница вошедшего зависит ещё и от его сессии и CSRF-токена,
+        # время изменения которых неизвестно, поэтому для него только ETag.
+        if request.user.is_authenticated:
+            last_modified = None
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # Браузер должен перепроверять страницу, а не угадывать срок жизни.
+        if request.user.is_authenticated:
+            patch_cache_control(response, no_cache=True, private=True)
+        else:
+            patch_cache_control(response, no_cache=True)
+        return response
 
 
-class IndexListView(ListView):
+class IndexListView(ReplicaReadMixin, PageCacheMixin, ListView):
     template_name = 'posts/index.html'
     post_list = Post.objects.select_related('author', 'group')
     context_object_name = 'page_obj'
 
-    def get(self, request, *args, **kwargs):
-        self.page = self.request.GET.get('page')
-        return super().get(request, *args, **kwargs)
-
     def get_queryset(self):
-        paginator = Paginator(self.post_list, settings.SHOWING_POSTS)
-        return paginator.get_page(self.page)
+        return paginate_posts(
+            self.request,
+            self.post_list,
+            post_count(INDEX_FEED, self.post_list),
+        )
+
+    def get_page_cache_feeds(self):
+        return (INDEX_FEED,)
 
 
-class GroupListView(ListView):
+class GroupListView(ReplicaReadMixin, PageCacheMixin, ListView):
     template_name = 'posts/group_list.html'
     context_object_name = 'page_obj'
 
     def get(self, request, *args, **kwargs):
-        self.page = self.request.GET.get('page')
         slug = kwargs['slug']
         self.group = get_object_or_404(Group, slug=slug)
         self.group_list = self.group.posts.select_related('author')
         return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
-        paginator = Paginator(self.group_list, settings.SHOWING_POSTS)
-        return paginator.get_page(self.page)
+        return paginate_posts(
+            self.request, self.group_list, self.group.post_count
+        )
+
+    def get_page_cache_feeds(self):
+        return (feed_key('group', self.group.pk),)
 
     def get_context_data(self, **kwargs):
         context = super(GroupListView, self).get_context_data(**kwargs)
@@ -46,14 +101,16 @@ class GroupListView(ListView):
         return context
 
 
-class ProfileListView(ListView):
+class ProfileListView(ReplicaReadMixin, PageCacheMixin, ListView):
     template_name = 'posts/profile.html'
     context_object_name = 'page_obj'
 
     def get(self, request, *args, **kwargs):
-        self.page = self.request.GET.get('page')
         username = kwargs['username']
-        self.author = get_object_or_404(User, username=username)
+        self.author = get_object_or_404(
+            User.objects.select_related('profile'), username=username
+        )
+        self.profile = get_profile(self.author)
         self.profile_list = self.author.posts.select_related('group')
         self.following = (
             request.user.id != self.author.id
@@ -63,8 +120,16 @@ class ProfileListView(ListView):
         return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
-        paginator = Paginator(self.profile_list, settings.SHOWING_POSTS)
-        return paginator.get_page(self.page)
+        return paginate_posts(
+            self.request, self.profile_list, self.profile.post_count
+        )
+
+    def get_page_cache_feeds(self):
+        return (feed_key('profile', self.author.pk),)
+
+    def get_page_cache_state(self):
+        # Кнопка «Подписаться»/«Отписаться» своя у каждого читателя.
+        return (self.following,)
 
     def get_context_data(self, **kwargs):
         context = super(ProfileListView, self).get_context_data(**kwargs)
@@ -73,20 +138,47 @@ class ProfileListView(ListView):
         return context
 
 
-class PostDetailView(DetailView):
-    model = Post
+class PostDetailView(ReplicaReadMixin, PageCacheMixin, DetailView):
+    queryset = Post.objects.select_related('author__profile', 'group')
     template_name = 'posts/post_detail.html'
     context_object_name = 'target_post'
     pk_url_kwarg = 'post_id'
 
+    def get(self, request, *args, **kwargs):
+        # Ленты страницы зависят от поста, поэтому он читается до проверки
+        # ETag; DetailView.get потом берёт уже прочитанный.
+        self.object = self.get_object()
+        get_profile(self.object.author)
+        return super().get(request, *args, **kwargs)
+
+    def get_object(self, queryset=None):
+        if getattr(self, 'object', None) is not None:
+            return self.object
+        return super().get_object(queryset)
+
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data(**kwargs)
         target_post = context.get('target_post')
-        comments = target_post.comments.all()
+        # Комментарии с авторами одним запросом и порциями по курсору.
+        # Запрос выполняется только при рендере, а ответ 304 его не делает.
+        comments = SimpleLazyObject(
+            lambda: CursorPaginator(
+                target_post.comments.select_related('author'),
+                settings.SHOWING_COMMENTS,
+                ordering=('-pub_date', 'pk'),
+            ).get_page(self.request.GET.get('comments_after'))
+        )
         context['form'] = CommentForm()
         context['comments'] = comments
         return context
 
+    def get_page_cache_feeds(self):
+        # На странице поста есть и число постов автора.
+        return (
+            feed_key('post', self.object.pk),
+            feed_key('profile', self.object.author_id),
+        )
+
 
 @method_decorator(login_required, name="dispatch")
 class PostCreateView(CreateView):
@@ -153,22 +245,47 @@ class AddCommentView(CreateView):
 
 
 @method_decorator(login_required, name="dispatch")
-class FollowListView(ListView):
+class FollowListView(ReplicaReadMixin, ListView):
     """Лента подписки"""
     model = Follow
     template_name = 'posts/follow.html'
     context_object_name = 'page_obj'
 
     def get(self, request, *args, **kwargs):
-        self.page = self.request.GET.get('page')
-        self.follow_list = Post.objects.filter(
-            author__following__user=self.request.user
+        self.follow_list = follow_posts(
+            self.request.user
+        ).select_related('author', 'group')
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self):
+        return paginate_posts(self.request, self.follow_list)
+
+
+class SearchView(ReplicaReadMixin, ListView):
+    """Поиск по текстам постов и комментариев"""
+    template_name = 'posts/search.html'
+    context_object_name = 'page_obj'
+
+    def get(self, request, *args, **kwargs):
+        self.form = SearchForm(request.GET or None)
+        self.query = (
+            self.form.cleaned_data['q'] if self.form.is_valid() else ''
         )
         return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
-        paginator = Paginator(self.follow_list, settings.SHOWING_POSTS)
-        return paginator.get_page(self.page)
+        results = search_posts(
+            Post.objects.select_related('author', 'group'), self.query
+        )
+        # Результаты упорядочены по релевантности, курсор по дате к ним
+        # не подходит.
+        return paginate_posts(self.request, results, allow_cursor=False)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['form'] = self.form
+        context['query'] = self.query
+        return context
 
 
 @method_decorator(login_required, name="dispatch")
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from core import routers
+
+
+def user_cache_key(user_id) -> str:
+    return f'user:{user_id}'
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend, который берёт пользователя сессии из кэша.
+
+    AuthenticationMiddleware ищет request.user по id из сессии на каждом
+    запросе; здесь этот запрос к auth_user выполняется один раз за
+    USER_CACHE_TIMEOUT. Сигнал сбрасывает запись при сохранении и удалении
+    пользователя, в том числе при смене пароля, поэтому проверка хэша
+    сессии видит новый пароль сразу. USER_CACHE_TIMEOUT = 0 отключает кэш.
+    """
+
+    def get_user(self, user_id):
+        timeout = settings.USER_CACHE_TIMEOUT
+        if not timeout:
+            return super().get_user(user_id)
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            # Из отстающей реплики можно прочитать старый пароль или
+            # флаг is_active, в общий кэш такая запись не попадает.
+            if user is not None and not routers.reads_from_replica():
+                cache.set(key, user, timeout)
+        return user if self.user_can_authenticate(user) else None
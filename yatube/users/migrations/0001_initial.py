@@ -0,0 +1,41 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_profiles(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Profile = apps.get_model('users', 'Profile')
+    Profile.objects.bulk_create(
+        (Profile(user_id=pk) for pk in User.objects.values_list('pk', flat=True)),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Profile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_count', models.PositiveIntegerField(default=0, editable=False, verbose_name='Число постов')),
+                ('follower_count', models.PositiveIntegerField(default=0, editable=False, verbose_name='Число подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, editable=False, verbose_name='Число подписок')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='profile', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'профиль',
+                'verbose_name_plural': 'Профили',
+            },
+        ),
+        migrations.RunPython(create_profiles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-18 09:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_popular(apps, schema_editor):
+    """Отмечает авторов, чьи посты уже не раскладывались по лентам."""
+    Profile = apps.get_model('users', 'Profile')
+    Profile.objects.filter(
+        follower_count__gt=settings.FEED_FANOUT_LIMIT
+    ).update(feed_pull=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='feed_pull',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Посты подтягиваются в ленты при чтении'),
+        ),
+        migrations.RunPython(mark_popular, migrations.RunPython.noop),
+    ]
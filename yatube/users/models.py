@@ -1 +1,36 @@
-# Create your models here.
+from django.contrib.auth import get_user_model
+from django.db import models
+
+User = get_user_model()
+
+
+class Profile(models.Model):
+    """Профиль пользователя со счётчиками постов и подписок."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name="profile",
+        verbose_name="Пользователь",
+    )
+    post_count = models.PositiveIntegerField(
+        "Число постов", default=0, editable=False
+    )
+    follower_count = models.PositiveIntegerField(
+        "Число подписчиков", default=0, editable=False
+    )
+    following_count = models.PositiveIntegerField(
+        "Число подписок", default=0, editable=False
+    )
+    feed_pull = models.BooleanField(
+        "Посты подтягиваются в ленты при чтении",
+        default=False,
+        editable=False,
+    )
+
+    class Meta:
+        verbose_name: str = "профиль"
+        verbose_name_plural: str = "Профили"
+
+    def __str__(self) -> str:
+        return str(self.user)
@@ -0,0 +1,76 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+User = get_user_model()
+
+
+@override_settings(
+    USER_CACHE_TIMEOUT=60 * 60,
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+)
+class CachedUserTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth', password='pass')
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client.force_login(self.user)
+        self.url = reverse('posts_page:follow_index')
+
+    def user_queries(self):
+        """Запросы к auth_user и django_session при открытии страницы."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return [
+            query['sql'] for query in queries
+            if '"auth_user"' in query['sql']
+            or '"django_session"' in query['sql']
+        ]
+
+    def test_user_and_session_cached(self):
+        """Повторный запрос не ищет пользователя и сессию в базе"""
+        self.client.get(self.url)
+
+        self.assertEqual(self.user_queries(), [])
+
+    @override_settings(
+        USER_CACHE_TIMEOUT=0,
+        SESSION_ENGINE='django.contrib.sessions.backends.db',
+    )
+    def test_cache_disabled(self):
+        """Без кэша пользователь и сессия читаются из базы"""
+        self.client.force_login(self.user)
+        self.client.get(self.url)
+
+        self.assertEqual(len(self.user_queries()), 2)
+
+    def test_password_change_invalidates(self):
+        """После смены пароля старая сессия больше не действует"""
+        self.client.get(self.url)
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password('new-pass')
+        user.save()
+
+        response = self.client.get(self.url)
+
+        self.assertRedirects(
+            response, f'{reverse("users:login")}?next={self.url}'
+        )
+
+    def test_user_save_invalidates(self):
+        """Изменённый пользователь сразу виден в request.user"""
+        self.client.get(self.url)
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = 'Новое'
+        user.save()
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.context['user'].first_name, 'Новое')
@@ -18,7 +18,8 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 
-DEBUG = True
+# В продакшене DEBUG=False: шаблоны тогда кэшируются (см. TEMPLATE_CACHE).
+DEBUG = os.getenv("DEBUG", "True").lower() not in ("0", "false", "no")
 
 ALLOWED_HOSTS = ["*"]
 
@@ -27,6 +28,7 @@ INSTALLED_APPS = [
     "posts.apps.PostsConfig",
     "core.apps.CoreConfig",
     "about.apps.AboutConfig",
+    "benchmark.apps.BenchmarkConfig",
     "django.contrib.admin",
     "django.contrib.auth",
     "django.contrib.contenttypes",
@@ -37,6 +39,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.QueryInstrumentationMiddleware",
+    "core.middleware.ReplicaPinningMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -44,17 +48,31 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "posts.middleware.AnonymousPageCacheMiddleware",
 ]
 
 ROOT_URLCONF = "yatube.urls"
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
+# Кэширующий загрузчик читает и разбирает шаблон один раз на процесс, а
+# core при старте заранее компилирует все шаблоны (core.warmup). При
+# разработке кэш выключен, чтобы правки шаблонов были видны сразу;
+# TEMPLATE_CACHE=1 или 0 включает или выключает его явно.
+TEMPLATE_CACHE = os.getenv("TEMPLATE_CACHE", "0" if DEBUG else "1") == "1"
+TEMPLATE_LOADERS = [
+    "django.template.loaders.filesystem.Loader",
+    "django.template.loaders.app_directories.Loader",
+]
+if TEMPLATE_CACHE:
+    TEMPLATE_LOADERS = [("django.template.loaders.cached.Loader", TEMPLATE_LOADERS)]
+# Компилировать ли все шаблоны при запуске процесса, до первого запроса.
+TEMPLATE_WARMUP = os.getenv("TEMPLATE_WARMUP", str(int(TEMPLATE_CACHE))) == "1"
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
         "DIRS": [TEMPLATES_DIR],
-        "APP_DIRS": True,
         "OPTIONS": {
+            "loaders": TEMPLATE_LOADERS,
             "context_processors": [
                 "django.template.context_processors.debug",
                 "django.template.context_processors.request",
@@ -72,7 +90,38 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
+        # Соединение живёт между запросами, а не открывается заново.
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", 60)),
+    }
+}
+
+# Реплика для чтения: DB_REPLICA_NAME — путь к её файлу SQLite. Локально
+# её обновляет команда sync_replica. Страницы-списки и страницы постов
+# читают из реплики, запись и остальные страницы работают с default.
+REPLICA_DATABASE = None
+if os.getenv("DB_REPLICA_NAME"):
+    REPLICA_DATABASE = "replica"
+    DATABASES[REPLICA_DATABASE] = {
+        **DATABASES["default"],
+        "NAME": os.getenv("DB_REPLICA_NAME"),
+        "TEST": {"MIRROR": "default"},
     }
+DATABASE_ROUTERS = ["core.routers.PrimaryReplicaRouter"]
+# Сколько секунд после записи пользователь читает только из default.
+REPLICA_STICKY_SECONDS: int = int(os.getenv("REPLICA_STICKY_SECONDS", 5))
+
+# Выполняются для каждого нового соединения с SQLite (core.signals).
+# WAL позволяет читать во время записи; synchronous=NORMAL в режиме WAL
+# не теряет целостность, только последние транзакции при сбое питания.
+# busy_timeout идёт первым, чтобы действовать и на остальные прагмы.
+SQLITE_PRAGMAS: dict = {
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT", 5000)),
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    # Отрицательное значение — размер в КиБ, здесь 64 МиБ.
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", -64 * 1024)),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+    "temp_store": "MEMORY",
 }
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -120,13 +169,152 @@ CSRF_FAILURE_VIEW = "core.views.csrf_failure"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Миниатюры готовятся после ответа на запрос, а не во время рендера.
+THUMBNAIL_BACKEND = "posts.thumbnails.DeferredThumbnailBackend"
+# Размеры, которые используют шаблоны постов: (геометрия, опции).
+THUMBNAIL_PREGENERATE: tuple = (("960x339", {"crop": "center"}),)
+# Сколько потоков каждого процесса режут миниатюры и копии картинок после
+# ответа; 0 — резать в потоке запроса сразу после отправки ответа, как при
+# разработке: так файлы готовы к следующему запросу.
+THUMBNAIL_WORKERS: int = int(os.getenv("THUMBNAIL_WORKERS", 0 if DEBUG else 2))
+
+# Адаптивные копии картинок постов для <picture>/srcset (posts.variants):
+# ширины, форматы (последний — запасной) и пропорции кадра, как у миниатюры.
+IMAGE_VARIANT_WIDTHS: tuple = (320, 640, 960)
+IMAGE_VARIANT_FORMATS: tuple = ("webp", "jpeg")
+IMAGE_VARIANT_RATIO: tuple = (960, 339)
+IMAGE_VARIANT_QUALITY: int = 80
+# Ширина размытой заглушки, которая видна, пока грузится картинка.
+IMAGE_PLACEHOLDER_WIDTH: int = 16
+
+# Бюджет каталога миниатюр media/cache в байтах для команды gc_thumbnails:
+# сверх него удаляются давно не использовавшиеся миниатюры; 0 — без
+# ограничения.
+THUMBNAIL_CACHE_MAX_SIZE: int = int(
+    os.getenv("THUMBNAIL_CACHE_MAX_SIZE", 1024 * 1024 * 1024)
+)
+
+# Бэкенд кэша выбирается переменной окружения CACHE_BACKEND:
+# locmem — свой кэш в каждом процессе (по умолчанию при DEBUG);
+# sqlite — файл SQLite, общий для всех воркеров на машине, с вытеснением
+# давно не читавшихся записей (LRU; по умолчанию без DEBUG: сброс лент,
+# счётчиков и пользователя сессии должны видеть все воркеры);
+# file — каталог с файлами, тоже общий, но без LRU;
+# memcached — внешний сервер, адрес в CACHE_LOCATION (пакет python-memcached).
+# Для sqlite и file число записей ограничивает CACHE_MAX_ENTRIES,
+# для sqlite ещё и общий объём значений в байтах — CACHE_MAX_SIZE.
+CACHE_BACKENDS = {
+    "locmem": ("django.core.cache.backends.locmem.LocMemCache", ""),
+    "sqlite": ("core.cache.SQLiteCache", os.path.join(BASE_DIR, "cache.sqlite3")),
+    "file": (
+        "django.core.cache.backends.filebased.FileBasedCache",
+        os.path.join(BASE_DIR, "cache"),
+    ),
+    "memcached": (
+        "django.core.cache.backends.memcached.MemcachedCache",
+        "127.0.0.1:11211",
+    ),
+}
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "locmem" if DEBUG else "sqlite")
+if CACHE_BACKEND not in CACHE_BACKENDS:
+    raise ImproperlyConfigured(
+        "CACHE_BACKEND должен быть одним из: {}".format(", ".join(CACHE_BACKENDS))
+    )
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "BACKEND": CACHE_BACKENDS[CACHE_BACKEND][0],
+        "LOCATION": os.getenv("CACHE_LOCATION", CACHE_BACKENDS[CACHE_BACKEND][1]),
     }
 }
+if CACHE_BACKEND in ("sqlite", "file"):
+    CACHES["default"]["OPTIONS"] = {
+        "MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", 10000)),
+    }
+if CACHE_BACKEND == "sqlite":
+    CACHES["default"]["OPTIONS"]["MAX_SIZE"] = int(
+        os.getenv("CACHE_MAX_SIZE", 64 * 1024 * 1024)
+    )
+
+# Хранилище сессий выбирается переменной окружения SESSION_BACKEND:
+# cached_db — чтение из кэша, запись ещё и в базу (по умолчанию с общим кэшем);
+# db — только база (по умолчанию с locmem: выход и flush() сессии в одном
+# воркере не сбросили бы её в кэшах остальных); cache — только кэш (нужен
+# общий бэкенд кэша); signed_cookies — подписанная cookie, без обращений
+# к хранилищу.
+SESSION_BACKENDS = ("cached_db", "db", "cache", "signed_cookies")
+SESSION_BACKEND = os.getenv(
+    "SESSION_BACKEND", "db" if CACHE_BACKEND == "locmem" else "cached_db"
+)
+if SESSION_BACKEND not in SESSION_BACKENDS:
+    raise ImproperlyConfigured(
+        "SESSION_BACKEND должен быть одним из: {}".format(
+            ", ".join(SESSION_BACKENDS)
+        )
+    )
+SESSION_ENGINE = "django.contrib.sessions.backends." + SESSION_BACKEND
+
+# Пользователь сессии берётся из кэша, а не из auth_user на каждом запросе.
+# Сессия помнит путь к бэкенду, которым вошёл пользователь: после смены
+# AUTHENTICATION_BACKENDS все вошедшие выйдут и войдут заново.
+AUTHENTICATION_BACKENDS = ["users.backends.CachedModelBackend"]
+# Срок жизни пользователя в кэше; 0 отключает кэш (USER_CACHE_TIMEOUT).
+# Сброс записи при смене пароля или блокировке виден только воркерам с
+# общим кэшем, поэтому с locmem кэш по умолчанию выключен.
+USER_CACHE_TIMEOUT: int = int(
+    os.getenv("USER_CACHE_TIMEOUT", 0 if CACHE_BACKEND == "locmem" else 60 * 60)
+)
 
 SHOWING_POSTS: int = 10
+SHOWING_COMMENTS: int = 20
+
+# Фрагменты лент сбрасываются сигналами, поэтому живут долго.
+FEED_CACHE_TIMEOUT: int = 60 * 60 * 6
+# Целые страницы для анонимов; устаревают так же, по версиям лент.
+PAGE_CACHE_TIMEOUT: int = 60 * 60
+# Счётчики постов в кэше: срок жизни ограничивает возможное расхождение.
+POST_COUNT_TIMEOUT: int = 60 * 60
+# До этого числа постов главная считает их точно, а не приблизительно.
+APPROXIMATE_COUNT_THRESHOLD: int = 10000
+
+# Постраничный вывод лент по курсору (?cursor=) вместо номера страницы.
+CURSOR_PAGINATION: bool = False
+
+# Лента подписки: посты авторов, у которых подписчиков больше лимита,
+# не раскладываются по лентам, а подтягиваются при чтении.
+FEED_FANOUT_LIMIT: int = 1000
+# Сколько последних постов автора добавить в ленту при подписке (и когда
+# автор перестаёт быть популярным). Более старые посты обычного автора
+# в ленте подписки не появятся, они остаются в его профиле.
+FEED_BACKFILL_SIZE: int = 200
+
+# Бюджет SQL-запросов на страницу по имени маршрута: столько запросов
+# страница делает при пустом кэше (posts/tests/test_queries.py, отчёт
+# в QUERY_REPORT) плюс запас в один запрос. В ленте там есть картинки,
+# а у самой новой ещё нет копий. Без общего кэша сессия и пользователь
+# читаются из базы, это тоже учтено. Профилю запас больше: страница
+# автора без Profile создаёт его. При превышении пишется предупреждение
+# в лог core.performance, а при QUERY_BUDGET_RAISE — выбрасывается
+# QueryBudgetExceeded.
+QUERY_BUDGETS: dict = {
+    "posts_page:index": 8,
+    "posts_page:group_list": 6,
+    "posts_page:profile": 8,
+    "posts_page:post_detail": 7,
+    "posts_page:follow_index": 8,
+    "posts_page:search": 8,
+    "posts_page:post_create": 12,
+    "posts_page:post_edit": 13,
+    "posts_page:add_comment": 10,
+    "posts_page:profile_follow": 14,
+    "posts_page:profile_unfollow": 9,
+}
+QUERY_BUDGET_RAISE: bool = False
+
+# Нагрузочный тест (manage.py benchmark): отдельные база и кэш, каталог эталонов.
+BENCHMARK_DATABASE_NAME = os.path.join(BASE_DIR, "benchmark.sqlite3")
+# Файл (sqlite) или каталог (file) кэша бенчмарков, см. benchmark/environment.py.
+BENCHMARK_CACHE_NAME = os.path.join(BASE_DIR, "benchmark-cache")
+BENCHMARK_BASELINE_DIR = os.path.join(BASE_DIR, "benchmark", "baselines")
 
 # if DEBUG:
 #